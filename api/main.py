@@ -1,21 +1,92 @@
 #Frontend ----> API -----> logic ------> db ------> Response
 
-from fastapi import FastAPI, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()
+from fastapi import FastAPI, HTTPException, Query, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
 import sys,os
-from typing import Optional
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, List, Dict, Any, Literal
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+FRAMEWORK_IMPORTED = time.perf_counter()
 
 #import taskmanager from src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.logic import CustomerManager, CourierManager, ParcelManager, TrackingManager
-
-customer_manager = CustomerManager()
-courier_manager = CourierManager()
-parcel_manager = ParcelManager()
-tracking_manager = TrackingManager()
-
-app = FastAPI(title="Parcel management API", version="1.0")
+from src.db import init_async_client, close_async_client, close_client, db_timestamp
+from src.cache import cache_stats, table_versions
+from src.export import stream_export, MEDIA_TYPES
+from src.tracking_buffer import buffer_from_env
+from src.events import broker, stream_events
+from src.metrics import registry, MetricsMiddleware, startup
+from src.async_logic import (AsyncCustomerManager, AsyncCourierManager, AsyncParcelManager, AsyncTrackingManager, AsyncStatsManager,
+                              AsyncAssignmentManager)
+
+# Import cost, reported with the rest of the startup breakdown once the app is ready
+startup.record("import_framework", FRAMEWORK_IMPORTED - IMPORT_STARTED)
+startup.record("import_app", time.perf_counter() - FRAMEWORK_IMPORTED)
+
+customer_manager = AsyncCustomerManager()
+courier_manager = AsyncCourierManager()
+parcel_manager = AsyncParcelManager()
+tracking_manager = AsyncTrackingManager()
+stats_manager = AsyncStatsManager()
+assignment_manager = AsyncAssignmentManager()
+
+# Page size for list endpoints (keyset pagination)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Largest batch accepted by the bulk endpoints
+MAX_BULK_ITEMS = 5000
+MAX_TRACKING_BATCH = 100
+MAX_ROLLUP_BUCKETS = 10000
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1000"))
+# ETags also roll over every ETAG_TTL seconds, bounding staleness when other workers write
+ETAG_TTL = float(os.getenv("ETAG_TTL", "30"))
+# Live tracking streams: keep-alive interval and the reconnect delay suggested to clients
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+SSE_MAX_AGE = float(os.getenv("SSE_MAX_AGE", "300"))
+SSE_RETRY_MS = 3000
+# FAST_JSON=1 encodes responses with orjson (pip install orjson) instead of the standard json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson (integer keys, e.g. of GET /tracking, become strings as with json)"""
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+ApiResponse = FastJSONResponse if FAST_JSON else JSONResponse
+
+@asynccontextmanager
+async def lifespan(app):
+    # One shared async database client (and HTTP connection pool) per worker
+    with startup.phase("init_db_client"):
+        await init_async_client()
+    # Optional write-behind mode for POST /tracking (TRACKING_WRITE_BEHIND=1)
+    with startup.phase("init_tracking_buffer"):
+        tracking_manager.buffer = buffer_from_env(tracking_manager.flush_buffered)
+        if tracking_manager.buffer:
+            await tracking_manager.buffer.start()
+    startup.log()
+    yield
+    broker.close()
+    if tracking_manager.buffer:
+        await tracking_manager.buffer.stop()
+        tracking_manager.buffer = None
+    await close_async_client()
+    close_client()
+
+app = FastAPI(title="Parcel management API", version="1.0", lifespan=lifespan, default_response_class=ApiResponse)
 # Allow CORS (for frontend calls)
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +95,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request count and latency per route, exported on GET /metrics
+app.add_middleware(MetricsMiddleware)
+# gzip (or brotli when brotli-asgi is installed) for large bodies; exports bring their own gzip option
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True, excluded_handlers=["^/export/", "/stream$"])
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
 
 #----Data Models------
 # ------------------ Customer Models ------------------
@@ -61,31 +140,44 @@ class CourierResponse(BaseModel):
     courier_id: int
     name: str
     phone: str
-    vehicle_no: str
+    vehicle_no: Optional[str] = None
 
 # ------------------ Parcel Models ------------------
+# Same values as PARCEL_STATUSES; anything else is answered with 422
+ParcelStatus = Literal["Pending", "In Transit", "Delivered", "Cancelled"]
+
 class ParcelCreate(BaseModel):
     sender_id: int
     receiver_id: int
     weight: float
     price: float
-    status: str = "Pending"
+    status: ParcelStatus = "Pending"
 
 class ParcelUpdate(BaseModel):
     sender_id: Optional[int] = None
     receiver_id: Optional[int] = None
     weight: Optional[float] = None
     price: Optional[float] = None
-    status: Optional[str] = None
+    status: Optional[ParcelStatus] = None
+
+class ParcelScan(BaseModel):
+    courier_id: int
+    location: str
+    remarks: Optional[str] = ""
+    status: Optional[ParcelStatus] = None  # new status, or None to keep the current one
 
 class ParcelResponse(BaseModel):
     parcel_id: int
-    sender_id: int
-    receiver_id: int
+    sender_id: Optional[int] = None
+    receiver_id: Optional[int] = None
     weight: float
     price: float
     status: str
-    created_at: str
+    created_at: Optional[str] = None
+
+class ParcelDetailResponse(ParcelResponse):
+    sender: Optional[CustomerResponse] = None
+    receiver: Optional[CustomerResponse] = None
 
 # ------------------ Tracking Models ------------------
 class TrackingCreate(BaseModel):
@@ -103,130 +195,529 @@ class TrackingUpdate(BaseModel):
 class TrackingResponse(BaseModel):
     tracking_id: int
     parcel_id: int
-    courier_id: int
+    courier_id: Optional[int] = None  # NULL once the courier is deleted
     location: str
-    remarks: str
-    timestamp: str
+    remarks: Optional[str] = None
+    timestamp: Optional[str] = None
+
+# ------------------ List Response Models ------------------
+# Schemas of the list endpoints. Their rows go straight to the response encoder without being
+# re-validated, which also lets `fields` return partial rows.
+class CustomerPage(BaseModel):
+    success: bool
+    data: List[CustomerResponse]
+    next_cursor: Optional[int] = None
+
+class CourierPage(BaseModel):
+    success: bool
+    data: List[CourierResponse]
+    next_cursor: Optional[int] = None
+
+class ParcelPage(BaseModel):
+    success: bool
+    data: List[ParcelResponse]
+    next_cursor: Optional[int] = None
+
+class TrackingList(BaseModel):
+    success: bool
+    data: List[TrackingResponse]
+
+class TrackingBatch(BaseModel):
+    success: bool
+    data: Dict[int, List[TrackingResponse]]
+
+
+# ------------------ Query Helpers ------------------
+FIELDS_QUERY = Query(None, description="Comma-separated columns to return, e.g. parcel_id,status")
+
+def parse_fields(fields):
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+# ------------------ Conditional GET Helpers ------------------
+def check_etag(request, tables):
+    """ETag / Last-Modified headers for a read of `tables`, and a 304 response when the client copy is current"""
+    versions, modified = table_versions.get(tables)
+    window = int(time.time() // ETAG_TTL) if ETAG_TTL > 0 else 0
+    if window:
+        modified = max(modified, window * ETAG_TTL)
+    token = f"{request.url.path}?{request.url.query}|{versions}|{window}|{table_versions.started}"
+    etag = 'W/"' + hashlib.sha1(token.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True), "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers=headers), headers
+    elif request.headers.get("if-modified-since"):
+        try:
+            if int(modified) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers), headers
+        except (TypeError, ValueError):
+            pass
+    return None, headers
+
+
+# ------------------ Bulk Helpers ------------------
+async def bulk_create(add_many, model, items):
+    """Validate every item on its own so one bad record does not reject the whole batch"""
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per request")
+    results, positions, valid = [None] * len(items), [], []
+    for i, item in enumerate(items):
+        try:
+            valid.append(model.model_validate(item).model_dump())
+            positions.append(i)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(loc) for loc in error["loc"])
+            results[i] = {"index": i, "success": False, "message": f"{field}: {error['msg']}"}
+    result = await add_many(valid)
+    for i, item_result in zip(positions, result["results"]):
+        results[i] = {**item_result, "index": i}
+    succeeded = sum(1 for r in results if r["success"])
+    return {"success": True, "inserted": succeeded, "failed": len(results) - succeeded, "results": results}
 
 
 # ------------------ Customer Endpoints ------------------
 @app.post("/customers")
-def create_customer(customer: CustomerCreate):
-    result = customer_manager.add(**customer.model_dump())
+async def create_customer(customer: CustomerCreate):
+    result = await customer_manager.add(**customer.model_dump())
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
-@app.get("/customers")
-def get_customers():
-    result = customer_manager.get_all()
+@app.post("/customers/bulk")
+async def create_customers_bulk(customers: List[Dict[str, Any]] = Body(...)):
+    return await bulk_create(customer_manager.add_many, CustomerCreate, customers)
+
+@app.get("/customers/search", response_model=CustomerPage)
+async def search_customers(request: Request, q: str = Query(..., min_length=1, max_length=100),
+                         limit: int = Query(20, ge=1, le=100)):
+    not_modified, headers = check_etag(request, ("customers",))
+    if not_modified:
+        return not_modified
+    result = await customer_manager.search(q, limit)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
-    return result
+    return ApiResponse(result, headers=headers)
+
+@app.get("/customers", response_model=CustomerPage)
+async def get_customers(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[int] = None,
+                        fields: Optional[str] = FIELDS_QUERY, name: Optional[str] = None,
+                        email: Optional[str] = None, phone: Optional[str] = None):
+    not_modified, headers = check_etag(request, ("customers",))
+    if not_modified:
+        return not_modified
+    filters = {"name": name, "email": email, "phone": phone}
+    result = await customer_manager.get_all(limit, after, parse_fields(fields), filters)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.get("/customers/{customer_id}", response_model=CustomerResponse)
+async def get_customer(customer_id: int, request: Request, response: Response):
+    not_modified, headers = check_etag(request, ("customers",))
+    if not_modified:
+        return not_modified
+    result = await customer_manager.get(customer_id)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    if result["data"] is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    response.headers.update(headers)
+    return result["data"]
 
 @app.put("/customers/{customer_id}")
-def update_customer(customer_id: int, customer: CustomerUpdate):
-    result = customer_manager.update(customer_id, **customer.model_dump(exclude_unset=True))
+async def update_customer(customer_id: int, customer: CustomerUpdate):
+    result = await customer_manager.update(customer_id, **customer.model_dump(exclude_unset=True))
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 @app.delete("/customers/{customer_id}")
-def delete_customer(customer_id: int):
-    result = customer_manager.delete(customer_id)
+async def delete_customer(customer_id: int):
+    result = await customer_manager.delete(customer_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 # ------------------ Courier Endpoints ------------------
 @app.post("/couriers")
-def create_courier(courier: CourierCreate):
-    result = courier_manager.add(**courier.model_dump())
+async def create_courier(courier: CourierCreate):
+    result = await courier_manager.add(**courier.model_dump())
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
-@app.get("/couriers")
-def get_couriers():
-    result = courier_manager.get_all()
+@app.get("/couriers/search", response_model=CourierPage)
+async def search_couriers(request: Request, q: str = Query(..., min_length=1, max_length=100),
+                        limit: int = Query(20, ge=1, le=100)):
+    not_modified, headers = check_etag(request, ("couriers",))
+    if not_modified:
+        return not_modified
+    result = await courier_manager.search(q, limit)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
-    return result
+    return ApiResponse(result, headers=headers)
+
+@app.get("/couriers", response_model=CourierPage)
+async def get_couriers(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[int] = None,
+                       fields: Optional[str] = FIELDS_QUERY, name: Optional[str] = None,
+                       phone: Optional[str] = None, vehicle_no: Optional[str] = None):
+    not_modified, headers = check_etag(request, ("couriers",))
+    if not_modified:
+        return not_modified
+    filters = {"name": name, "phone": phone, "vehicle_no": vehicle_no}
+    result = await courier_manager.get_all(limit, after, parse_fields(fields), filters)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.get("/couriers/{courier_id}", response_model=CourierResponse)
+async def get_courier(courier_id: int, request: Request, response: Response):
+    not_modified, headers = check_etag(request, ("couriers",))
+    if not_modified:
+        return not_modified
+    result = await courier_manager.get(courier_id)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    if result["data"] is None:
+        raise HTTPException(status_code=404, detail="Courier not found")
+    response.headers.update(headers)
+    return result["data"]
 
 @app.put("/couriers/{courier_id}")
-def update_courier(courier_id: int, courier: CourierUpdate):
-    result = courier_manager.update(courier_id, **courier.model_dump(exclude_unset=True))
+async def update_courier(courier_id: int, courier: CourierUpdate):
+    result = await courier_manager.update(courier_id, **courier.model_dump(exclude_unset=True))
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 @app.delete("/couriers/{courier_id}")
-def delete_courier(courier_id: int):
-    result = courier_manager.delete(courier_id)
+async def delete_courier(courier_id: int):
+    result = await courier_manager.delete(courier_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 # ------------------ Parcel Endpoints ------------------
 @app.post("/parcels")
-def create_parcel(parcel: ParcelCreate):
-    result = parcel_manager.add(**parcel.model_dump())
+async def create_parcel(parcel: ParcelCreate):
+    result = await parcel_manager.add(**parcel.model_dump())
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
-@app.get("/parcels")
-def get_parcels():
-    result = parcel_manager.get_all()
+@app.post("/parcels/bulk")
+async def create_parcels_bulk(parcels: List[Dict[str, Any]] = Body(...)):
+    return await bulk_create(parcel_manager.add_many, ParcelCreate, parcels)
+
+@app.get("/parcels", response_model=ParcelPage)
+async def get_parcels(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[int] = None,
+                      fields: Optional[str] = FIELDS_QUERY, status: Optional[ParcelStatus] = None,
+                      sender_id: Optional[int] = None, receiver_id: Optional[int] = None,
+                      created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                      min_weight: Optional[float] = None, max_weight: Optional[float] = None,
+                      min_price: Optional[float] = None, max_price: Optional[float] = None):
+    not_modified, headers = check_etag(request, ("parcels",))
+    if not_modified:
+        return not_modified
+    filters = {
+        "status": status,
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "created_from": db_timestamp(created_from),
+        "created_to": db_timestamp(created_to),
+        "min_weight": min_weight,
+        "max_weight": max_weight,
+        "min_price": min_price,
+        "max_price": max_price,
+    }
+    result = await parcel_manager.get_all(limit, after, parse_fields(fields), filters)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.post("/parcels/{parcel_id}/scan")
+async def scan_parcel(parcel_id: int, scan: ParcelScan):
+    # Tracking insert + status transition in one database call (Pending -> In Transit -> Delivered)
+    result = await parcel_manager.scan(parcel_id, **scan.model_dump())
+    if not result["success"]:
+        status_code = {"not_found": 404, "invalid_transition": 409}.get(result.get("error"), 400)
+        raise HTTPException(status_code=status_code, detail=result["message"])
     return result
 
+@app.get("/parcels/{parcel_id}/status")
+async def get_parcel_status(request: Request, parcel_id: int):
+    not_modified, headers = check_etag(request, ("parcels", "tracking"))
+    if not_modified:
+        return not_modified
+    result = await parcel_manager.get_status(parcel_id)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    if result["data"] is None:
+        raise HTTPException(status_code=404, detail="Parcel not found")
+    return ApiResponse(result, headers=headers)
+
+@app.get("/parcels/{parcel_id}", response_model=ParcelDetailResponse, response_model_exclude_unset=True)
+async def get_parcel(parcel_id: int, request: Request, response: Response,
+                     expand: bool = Query(False, description="Include sender and receiver (one joined query)")):
+    not_modified, headers = check_etag(request, ("parcels", "customers") if expand else ("parcels",))
+    if not_modified:
+        return not_modified
+    result = await parcel_manager.get(parcel_id, expand)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    if result["data"] is None:
+        raise HTTPException(status_code=404, detail="Parcel not found")
+    response.headers.update(headers)
+    return result["data"]
+
 @app.put("/parcels/{parcel_id}")
-def update_parcel(parcel_id: int, parcel: ParcelUpdate):
-    result = parcel_manager.update(parcel_id, **parcel.model_dump(exclude_unset=True))
+async def update_parcel(parcel_id: int, parcel: ParcelUpdate):
+    result = await parcel_manager.update(parcel_id, **parcel.model_dump(exclude_unset=True))
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 @app.delete("/parcels/{parcel_id}")
-def delete_parcel(parcel_id: int):
-    result = parcel_manager.delete(parcel_id)
+async def delete_parcel(parcel_id: int):
+    result = await parcel_manager.delete(parcel_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 # ------------------ Tracking Endpoints ------------------
 @app.post("/tracking")
-def create_tracking(tracking: TrackingCreate):
-    result = tracking_manager.add(**tracking.model_dump())
+async def create_tracking(tracking: TrackingCreate):
+    result = await tracking_manager.add(**tracking.model_dump())
+    if result.get("retry_after"):
+        raise HTTPException(status_code=503, detail=result["message"], headers={"Retry-After": str(result["retry_after"])})
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
+    if result.get("queued"):
+        return ApiResponse(status_code=202, content=result)
     return result
 
-@app.get("/tracking/{parcel_id}")
-def get_tracking(parcel_id: int):
-    result = tracking_manager.get_by_parcel(parcel_id)
+@app.post("/tracking/bulk")
+async def create_tracking_bulk(events: List[Dict[str, Any]] = Body(...)):
+    return await bulk_create(tracking_manager.add_many, TrackingCreate, events)
+
+@app.get("/tracking", response_model=TrackingBatch)
+async def get_tracking_batch(request: Request, parcel_ids: str = Query(..., description="Comma-separated parcel IDs, e.g. 1,2,3"),
+                             limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Most recent events per parcel")):
+    not_modified, headers = check_etag(request, ("tracking",))
+    if not_modified:
+        return not_modified
+    try:
+        ids = [int(p) for p in parcel_ids.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="parcel_ids must be comma-separated integers")
+    if len(ids) > MAX_TRACKING_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TRACKING_BATCH} parcel IDs per request")
+    result = await tracking_manager.get_by_parcels(ids, limit)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.get("/tracking/rollups")
+async def get_tracking_rollups(request: Request, period: str = Query("hour", pattern="^(hour|day)$"),
+                               dimension: str = Query("courier", pattern="^(courier|location)$"),
+                               start: Optional[datetime] = None, end: Optional[datetime] = None,
+                               key: Optional[str] = Query(None, description="Only this courier_id or location"),
+                               limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_ROLLUP_BUCKETS)):
+    # Scan counts per bucket in [start, end), read from the rollup table instead of the raw events
+    not_modified, headers = check_etag(request, ("tracking", "tracking_rollups"))
+    if not_modified:
+        return not_modified
+    result = await tracking_manager.get_rollups(period, dimension, db_timestamp(start), db_timestamp(end), key, limit)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.post("/tracking/rollups/backfill")
+async def backfill_tracking_rollups(start: Optional[datetime] = None, end: Optional[datetime] = None):
+    # Recount whole days from the tracking table, e.g. once after the rollup table is created
+    result = await tracking_manager.backfill_rollups(db_timestamp(start), db_timestamp(end))
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
+@app.get("/tracking/stream")
+async def stream_tracking(parcel_ids: Optional[str] = Query(None, description="Comma-separated parcel IDs; omit to follow all parcels")):
+    # Server-Sent Events: `tracking` events for new/updated scans, `status` events for status changes
+    try:
+        ids = [int(p) for p in parcel_ids.split(",") if p.strip()] if parcel_ids else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="parcel_ids must be comma-separated integers")
+    return sse_response(ids)
+
+@app.get("/tracking/{parcel_id}/stream")
+async def stream_parcel_tracking(parcel_id: int):
+    return sse_response([parcel_id])
+
+def sse_response(parcel_ids):
+    async def frames():
+        subscription = broker.subscribe(parcel_ids)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            async for frame in stream_events(subscription, SSE_HEARTBEAT, SSE_MAX_AGE):
+                yield frame
+        finally:
+            broker.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(frames(), media_type="text/event-stream", headers=headers)
+
+@app.get("/tracking/{parcel_id}", response_model=TrackingList)
+async def get_tracking(request: Request, parcel_id: int):
+    not_modified, headers = check_etag(request, ("tracking",))
+    if not_modified:
+        return not_modified
+    result = await tracking_manager.get_by_parcel(parcel_id)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
 @app.put("/tracking/{tracking_id}")
-def update_tracking(tracking_id: int, tracking: TrackingUpdate):
-    result = tracking_manager.update(tracking_id, **tracking.model_dump(exclude_unset=True))
+async def update_tracking(tracking_id: int, tracking: TrackingUpdate):
+    result = await tracking_manager.update(tracking_id, **tracking.model_dump(exclude_unset=True))
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 @app.delete("/tracking/{tracking_id}")
-def delete_tracking(tracking_id: int):
-    result = tracking_manager.delete(tracking_id)
+async def delete_tracking(tracking_id: int):
+    result = await tracking_manager.delete(tracking_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
+# ------------------ Assignment Endpoints ------------------
+@app.post("/assignments/run")
+async def run_assignments(reassign: bool = Query(False, description="Also move parcels that already have a courier"),
+                          max_parcels: Optional[int] = Query(None, ge=1, description="Most parcels per courier"),
+                          weight_factor: float = Query(1.0, ge=0, description="Weight of parcel weight against parcel count in a courier's load")):
+    # Balances every pending parcel over all couriers by parcel count and weight, then saves the assignments in bulk
+    result = await assignment_manager.run(reassign, max_parcels, weight_factor)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+@app.get("/assignments")
+async def get_assignments(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[int] = None,
+                          courier_id: Optional[int] = None):
+    not_modified, headers = check_etag(request, ("assignments",))
+    if not_modified:
+        return not_modified
+    result = await assignment_manager.get_all(limit, after, {"courier_id": courier_id})
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+# ------------------ Stats Endpoints ------------------
+@app.get("/stats")
+async def get_stats(request: Request):
+    not_modified, headers = check_etag(request, ("customers", "couriers", "parcels"))
+    if not_modified:
+        return not_modified
+    result = await stats_manager.get()
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+# ------------------ Analytics Endpoints ------------------
+analytics = None
+
+def get_analytics():
+    """Parcel analytics, created on first use so pandas is not imported at worker startup"""
+    global analytics
+    if analytics is None:
+        from src.analytics import AsyncParcelAnalytics
+        analytics = AsyncParcelAnalytics(parcel_manager.db)
+    return analytics
+
+async def analytics_response(request, name, created_from, created_to, **options):
+    not_modified, headers = check_etag(request, ("parcels", "tracking"))
+    if not_modified:
+        return not_modified
+    result = await get_analytics().report(name, created_from, created_to, **options)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ApiResponse(result, headers=headers)
+
+@app.get("/analytics/revenue")
+async def get_daily_revenue(request: Request, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None):
+    # Parcels, revenue (cancelled parcels excluded) and weight per day
+    return await analytics_response(request, "revenue", created_from, created_to)
+
+@app.get("/analytics/weight")
+async def get_weight_distribution(request: Request, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None):
+    return await analytics_response(request, "weight", created_from, created_to)
+
+@app.get("/analytics/senders")
+async def get_sender_volume(request: Request, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                            created_from: Optional[datetime] = None, created_to: Optional[datetime] = None):
+    return await analytics_response(request, "senders", created_from, created_to, limit=limit)
+
+@app.get("/analytics/delivery-times")
+async def get_delivery_times(request: Request, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None):
+    # Hours from creation to the final scan of delivered parcels
+    return await analytics_response(request, "delivery", created_from, created_to)
+
+# ------------------ Export Endpoints ------------------
+def export_response(table, format, gzip):
+    headers = {"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    # Exports read the database directly, never through the read cache
+    db = parcel_manager.db
+    return StreamingResponse(stream_export(db, table, format, gzip), media_type=MEDIA_TYPES[format], headers=headers)
+
+@app.get("/export/parcels")
+async def export_parcels(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), gzip: bool = False):
+    return export_response("parcels", format, gzip)
+
+@app.get("/export/tracking")
+async def export_tracking(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), gzip: bool = False):
+    return export_response("tracking", format, gzip)
+
+@app.get("/tracking/buffer/stats")
+async def get_tracking_buffer_stats():
+    if not tracking_manager.buffer:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "data": tracking_manager.buffer.stats()}
+
+@app.get("/tracking/stream/stats")
+async def get_stream_stats():
+    return {"success": True, "data": broker.stats()}
+
+# ------------------ Metrics Endpoints ------------------
+def cache_metrics():
+    stats = cache_stats()
+    yield ("cache_hits_total", "counter", "Read cache hits by cache",
+           [({"cache": name}, s["hits"]) for name, s in stats.items()])
+    yield ("cache_misses_total", "counter", "Read cache misses by cache",
+           [({"cache": name}, s["misses"]) for name, s in stats.items()])
+    yield ("cache_entries", "gauge", "Entries currently held by each cache",
+           [({"cache": name}, s["size"]) for name, s in stats.items()])
+    if tracking_manager.buffer:
+        yield ("tracking_buffer_pending", "gauge", "Tracking events waiting in the write-behind buffer",
+               [({}, tracking_manager.buffer.stats()["pending"])])
+
+registry.register_collector(cache_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {"success": True, "data": cache_stats()}
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "Parcel Tracking API is running "}
 
 
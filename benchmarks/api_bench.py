@@ -0,0 +1,208 @@
+"""Load test for the FastAPI app against an in-process SQLite database.
+
+Seeds a configurable number of parcels, drives a weighted mix of read and
+write requests from concurrent workers and reports latency percentiles and
+throughput per endpoint. Results are written as JSON so runs can be compared.
+
+    python benchmarks/api_bench.py --parcels 100000 --concurrency 64 --duration 30 --output run.json
+    python benchmarks/api_bench.py --parcels 100000 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from seeding import SEED_CHUNK, SEED_START, seed_people, parcel_rows
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=10000, help="parcels to seed (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--customers", type=int, default=None, help="customers to seed (default parcels / 10)")
+    parser.add_argument("--couriers", type=int, default=200)
+    parser.add_argument("--tracking-per-parcel", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent client workers")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds to run the workload")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of requests that write")
+    parser.add_argument("--db-path", default=None, help="SQLite file to use (default: temporary file)")
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--compare", default=None, help="JSON report of a previous run to compare against")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# ----- Seeding -----
+def seed(db, parcels, customers, couriers, tracking_per_parcel, rng):
+    """Bulk-load synthetic data straight through DatabaseManager.insert_many"""
+    start = time.perf_counter()
+    seed_people(db, customers, couriers)
+    for first in range(1, parcels + 1, SEED_CHUNK):
+        ids = range(first, min(first + SEED_CHUNK, parcels + 1))
+        db.insert_many("parcels", parcel_rows(ids, customers, rng), SEED_CHUNK)
+        events = [{
+            "parcel_id": parcel_id,
+            "courier_id": rng.randint(1, couriers),
+            "location": f"Hub {rng.randint(1, 50)}",
+            "timestamp": (SEED_START + timedelta(minutes=parcel_id, hours=n)).isoformat(),
+            "remarks": "",
+        } for parcel_id in ids for n in range(tracking_per_parcel)]
+        db.insert_many("tracking", events, SEED_CHUNK)
+    return time.perf_counter() - start
+
+
+# ----- Workload -----
+def build_requests(args, customers, rng):
+    """Weighted (label, method, path factory, body factory) list for the mix"""
+    parcel = lambda: rng.randint(1, args.parcels)
+    reads = [
+        (30, "GET /parcels/{parcel_id}/status", "GET", lambda: f"/parcels/{parcel()}/status", None),
+        (20, "GET /tracking/{parcel_id}", "GET", lambda: f"/tracking/{parcel()}", None),
+        (5, "GET /tracking?parcel_ids", "GET", lambda: "/tracking?parcel_ids=" + ",".join(str(parcel()) for _ in range(50)), None),
+        (15, "GET /parcels", "GET", lambda: f"/parcels?limit=100&after={rng.randint(0, args.parcels)}", None),
+        (10, "GET /couriers", "GET", lambda: "/couriers?limit=100", None),
+        (5, "GET /customers", "GET", lambda: f"/customers?limit=100&after={rng.randint(0, customers)}", None),
+        (2, "GET /stats", "GET", lambda: "/stats", None),
+    ]
+    writes = [
+        (60, "POST /tracking", "POST", lambda: "/tracking", lambda: {
+            "parcel_id": parcel(), "courier_id": rng.randint(1, args.couriers), "location": f"Hub {rng.randint(1, 50)}"}),
+        (25, "PUT /parcels/{parcel_id}", "PUT", lambda: f"/parcels/{parcel()}", lambda: {
+            "status": rng.choice(["In Transit", "Delivered"])}),
+        (15, "POST /parcels", "POST", lambda: "/parcels", lambda: {
+            "sender_id": rng.randint(1, customers), "receiver_id": rng.randint(1, customers),
+            "weight": round(rng.uniform(0.1, 30), 2), "price": round(rng.uniform(20, 2000), 2)}),
+    ]
+    return reads, writes
+
+
+def pick(entries, rng):
+    return rng.choices(entries, weights=[e[0] for e in entries])[0]
+
+
+async def worker(client, reads, writes, write_ratio, deadline, samples, rng):
+    while time.perf_counter() < deadline:
+        _, label, method, path, body = pick(writes if rng.random() < write_ratio else reads, rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path(), json=body() if body else None)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        samples.setdefault(label, []).append((time.perf_counter() - start, ok))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for label, values in sorted(samples.items()):
+        latencies = sorted(v[0] * 1000 for v in values)
+        report[label] = {
+            "requests": len(values),
+            "errors": sum(1 for v in values if not v[1]),
+            "rps": round(len(values) / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+    return report
+
+
+def print_report(report, previous=None):
+    print(f"{'endpoint':34} {'reqs':>8} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in report.items():
+        line = (f"{label:34} {row['requests']:>8} {row['errors']:>5} {row['rps']:>9} "
+                f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+        old = (previous or {}).get(label)
+        if old and old["p95_ms"]:
+            line += f"   p95 {100 * (row['p95_ms'] - old['p95_ms']) / old['p95_ms']:+.1f}%  rps {100 * (row['rps'] - old['rps']) / max(old['rps'], 1e-9):+.1f}%"
+        print(line)
+
+
+async def run(args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    customers = args.customers or max(100, args.parcels // 10)
+    meta = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "parcels": args.parcels,
+        "customers": customers,
+        "couriers": args.couriers,
+        "tracking_per_parcel": args.tracking_per_parcel,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "write_ratio": args.write_ratio,
+    }
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        lifespan = None
+    else:
+        # Point DatabaseManager at a fresh local SQLite database before the app is imported
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = args.db_path or os.path.join(tempfile.mkdtemp(), "bench.db")
+        sys.path.insert(0, ROOT_DIR)
+        sys.path.insert(0, os.path.join(ROOT_DIR, "api"))
+        from src.db import DatabaseManager
+        import main
+
+        meta["seed_seconds"] = round(seed(DatabaseManager(), args.parcels, customers, args.couriers,
+                                          args.tracking_per_parcel, rng), 2)
+        print(f"Seeded {args.parcels} parcels in {meta['seed_seconds']}s ({os.environ['SQLITE_PATH']})")
+        lifespan = main.lifespan(main.app)
+        await lifespan.__aenter__()
+        transport = httpx.ASGITransport(app=main.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30)
+
+    reads, writes = build_requests(args, customers, rng)
+    samples = {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    async with client:
+        await asyncio.gather(*(
+            worker(client, reads, writes, args.write_ratio, deadline, samples, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ))
+    elapsed = time.perf_counter() - start
+    if lifespan:
+        await lifespan.__aexit__(None, None, None)
+
+    report = summarize(samples, elapsed)
+    total = sum(row["requests"] for row in report.values())
+    meta["total_rps"] = round(total / elapsed, 1)
+    return {"meta": meta, "endpoints": report}
+
+
+def main():
+    args = parse_args()
+    result = asyncio.run(run(args))
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["endpoints"]
+    print_report(result["endpoints"], previous)
+    print(f"total: {result['meta']['total_rps']} req/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Courier assignment at scale: planning alone and a full run against SQLite.
+
+Seeds pending parcels and couriers into a temporary SQLite database, times the
+heap planner on its own, then times AssignmentManager.run() end to end (read,
+plan, bulk upsert) and reports how evenly parcels and weight were spread.
+
+    python benchmarks/assignment_bench.py --parcels 100000 --couriers 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from seeding import SEED_CHUNK, seed_people, parcel_rows
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=100000, help="pending parcels to seed")
+    parser.add_argument("--couriers", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--db-path", default=None, help="SQLite file to use (default: temporary file)")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# ----- Seeding -----
+def seed(db, parcels, customers, couriers, rng):
+    """Bulk-load customers, couriers and pending parcels through DatabaseManager.insert_many"""
+    start = time.perf_counter()
+    seed_people(db, customers, couriers)
+    for first in range(1, parcels + 1, SEED_CHUNK):
+        ids = range(first, min(first + SEED_CHUNK, parcels + 1))
+        db.insert_many("parcels", parcel_rows(ids, customers, rng, "Pending"), SEED_CHUNK)
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = args.db_path or os.path.join(tempfile.mkdtemp(), "assignment_bench.db")
+    sys.path.insert(0, ROOT_DIR)
+    from src.assignment import plan_assignments, load_summary
+    from src.db import DatabaseManager
+    from src.logic import AssignmentManager
+
+    rng = random.Random(args.seed)
+    seconds = seed(DatabaseManager(), args.parcels, args.customers, args.couriers, rng)
+    print(f"Seeded {args.parcels} pending parcels and {args.couriers} couriers in {seconds:.2f}s ({os.environ['SQLITE_PATH']})")
+
+    parcels = [(i, round(rng.uniform(0.1, 30), 2)) for i in range(1, args.parcels + 1)]
+    start = time.perf_counter()
+    _, loads = plan_assignments(parcels, list(range(1, args.couriers + 1)))
+    plan_seconds = time.perf_counter() - start
+    print(f"plan only: {plan_seconds * 1000:.1f} ms  {load_summary(loads)}")
+
+    report = {"parcels": args.parcels, "couriers": args.couriers, "plan_only_ms": round(plan_seconds * 1000, 1)}
+    manager = AssignmentManager()
+    for label, options in [("first run", {}), ("incremental", {}), ("reassign", {"reassign": True})]:
+        start = time.perf_counter()
+        result = manager.run(**options)
+        total = time.perf_counter() - start
+        if not result["success"]:
+            sys.exit(result["message"])
+        data = result["data"]
+        report[label] = {**data, "total": round(total, 3)}
+        print(f"{label:12} assigned {data['assigned']:>7} in {total:.2f}s  {data['seconds']}  {data['load']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Synthetic data shared by the benchmarks, bulk-loaded through DatabaseManager.insert_many."""
+from datetime import datetime, timedelta
+
+# Rows per insert_many call while seeding
+SEED_CHUNK = 4000
+SEED_START = datetime(2025, 1, 1)
+STATUSES = ["Pending", "In Transit", "Delivered", "Cancelled"]
+
+
+def seed_people(db, customers, couriers):
+    """Insert customers 1..customers and couriers 1..couriers"""
+    db.insert_many("customers", [
+        {"name": f"Customer {i}", "email": f"customer{i}@example.com", "phone": f"9{i:09d}", "address": f"{i} Main Street"}
+        for i in range(1, customers + 1)
+    ], SEED_CHUNK)
+    db.insert_many("couriers", [
+        {"name": f"Courier {i}", "phone": f"8{i:09d}", "vehicle_no": f"KA-{i:04d}"}
+        for i in range(1, couriers + 1)
+    ], SEED_CHUNK)
+
+
+def parcel_rows(ids, customers, rng, status=None):
+    """Parcel rows for `ids`, created a minute apart, with random senders, weights, prices and (unless given) statuses"""
+    return [{
+        "sender_id": rng.randint(1, customers),
+        "receiver_id": rng.randint(1, customers),
+        "weight": round(rng.uniform(0.1, 30), 2),
+        "price": round(rng.uniform(20, 2000), 2),
+        "status": status or rng.choice(STATUSES),
+        "created_at": (SEED_START + timedelta(minutes=i)).isoformat(),
+    } for i in ids]
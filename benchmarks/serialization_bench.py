@@ -0,0 +1,115 @@
+"""Encode cost of list responses: the generic FastAPI path against the direct encoders.
+
+Builds synthetic customer, parcel and tracking pages shaped like the manager
+results and reports, per encoder, the time to encode a page and the bytes per
+row. No database or server is needed.
+
+    python benchmarks/serialization_bench.py --rows 1000 --rows 50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, action="append", help="rows per page (repeatable, default 1000 and 50000)")
+    parser.add_argument("--repeat", type=int, default=5, help="encodes per measurement; the fastest is reported")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    return parser.parse_args()
+
+
+# ----- Synthetic pages -----
+def customer_rows(n):
+    return [{"customer_id": i, "name": f"Customer {i}", "email": f"customer{i}@example.com",
+             "phone": f"9{i:09d}", "address": f"{i} Main Street"} for i in range(1, n + 1)]
+
+def parcel_rows(n):
+    base = datetime(2025, 1, 1)
+    return [{"parcel_id": i, "sender_id": i % 997 + 1, "receiver_id": i % 991 + 1, "weight": round(0.1 + i % 300 / 10, 2),
+             "price": round(20 + i % 1980 * 1.01, 2), "status": "In Transit",
+             "created_at": (base + timedelta(minutes=i)).isoformat()} for i in range(1, n + 1)]
+
+def tracking_rows(n):
+    base = datetime(2025, 1, 1)
+    return [{"tracking_id": i, "parcel_id": (i + 1) // 2, "courier_id": i % 200 + 1, "location": f"Hub {i % 50}",
+             "remarks": "", "timestamp": (base + timedelta(minutes=i)).isoformat()} for i in range(1, n + 1)]
+
+
+# ----- Encoders -----
+def build_encoders(model, api):
+    """Encoders keyed by name; each turns a page dict into response bytes"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    page = TypeAdapter(model)
+    encoders = {
+        # Manager dict passed to JSONResponse (FAST_JSON=0)
+        "json (JSONResponse)": lambda content: JSONResponse(content).body,
+        # Plain dict return value validated against the response model, then the generic encoder
+        "generic (validate + jsonable_encoder)": lambda content: JSONResponse(jsonable_encoder(page.validate_python(content))).body,
+        # Plain dict return value validated and dumped by pydantic
+        "model (validate + dump_json)": lambda content: page.dump_json(page.validate_python(content)),
+    }
+    if api.orjson is not None:
+        # Manager dict passed to the orjson response class (FAST_JSON=1)
+        encoders["orjson (FastJSONResponse)"] = lambda content: api.FastJSONResponse(content).body
+    else:
+        print("orjson is not installed, skipping the FAST_JSON encoder")
+    return encoders
+
+
+def measure(encode, content, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, os.path.join(ROOT_DIR, "api"))
+    os.environ.setdefault("DB_BACKEND", "sqlite")
+    os.environ.setdefault("SQLITE_PATH", ":memory:")
+    import main as api
+
+    pages = [
+        ("customers", customer_rows, api.CustomerPage),
+        ("parcels", parcel_rows, api.ParcelPage),
+        ("tracking", tracking_rows, api.TrackingList),
+    ]
+    report = []
+    print(f"{'page':10} {'rows':>7} {'encoder':38} {'ms':>9} {'us/row':>8} {'bytes/row':>10} {'vs json':>8}")
+    for rows in args.rows or [1000, 50000]:
+        for name, make_rows, model in pages:
+            content = {"success": True, "data": make_rows(rows)}
+            if "next_cursor" in model.model_fields:
+                content["next_cursor"] = rows
+            baseline = None
+            for label, encode in build_encoders(model, api).items():
+                seconds, size = measure(encode, content, args.repeat)
+                if label.startswith("json"):
+                    baseline = seconds
+                row = {"page": name, "rows": rows, "encoder": label, "ms": round(seconds * 1000, 2),
+                       "us_per_row": round(seconds * 1e6 / rows, 3), "bytes_per_row": round(size / rows, 1)}
+                report.append(row)
+                speedup = f"{baseline / seconds:.1f}x" if baseline else ""
+                print(f"{name:10} {rows:>7} {label:38} {row['ms']:>9} {row['us_per_row']:>8} {row['bytes_per_row']:>10} {speedup:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
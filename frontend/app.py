@@ -1,23 +1,117 @@
 import streamlit as st
 import sys, os
+from datetime import datetime, time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.logic import CustomerManager, CourierManager, ParcelManager, TrackingManager
-
-# Initialize managers
-customer_mgr = CustomerManager()
-courier_mgr = CourierManager()
-parcel_mgr = ParcelManager()
-tracking_mgr = TrackingManager()
+from src.logic import CustomerManager, CourierManager, ParcelManager, TrackingManager, StatsManager
+from src.db import escape_like
 
 # ---- Page Config ----
 st.set_page_config(page_title="Parcel Tracking System", layout="wide")
 
+# Seconds a cached read is reused across reruns; writes below clear it straight away
+CACHE_TTL = int(os.getenv("FRONTEND_CACHE_TTL", "30"))
+
+# Initialize managers once per server process, not on every rerun
+@st.cache_resource
+def get_managers():
+    return CustomerManager(), CourierManager(), ParcelManager(), TrackingManager(), StatsManager()
+
+customer_mgr, courier_mgr, parcel_mgr, tracking_mgr, stats_mgr = get_managers()
+
+# ---- Cached Reads ----
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_stats():
+    return stats_mgr.get()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_customers(limit, after, filters):
+    return customer_mgr.get_all(limit, after, filters=filters)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_couriers(limit, after, filters):
+    return courier_mgr.get_all(limit, after, filters=filters)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_parcels(limit, after, filters):
+    return parcel_mgr.get_all(limit, after, filters=filters)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_tracking(parcel_id):
+    return tracking_mgr.get_by_parcel(parcel_id)
+
+# Analytics (and pandas) are only loaded once the Analytics page is opened
+@st.cache_resource
+def get_analytics():
+    from src.analytics import ParcelAnalytics
+    return ParcelAnalytics()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Crunching parcels...")
+def load_report(name, created_from, created_to, **options):
+    return get_analytics().report(name, created_from, created_to, **options)
+
+def cached(loader, *args, **kwargs):
+    """Call a cached loader, dropping the entry again if the read failed so it is retried next rerun"""
+    result = loader(*args, **kwargs)
+    if not result["success"]:
+        loader.clear()
+    return result
+
+# ---- Paged Tables ----
+PAGE_SIZES = [25, 50, 100, 250]
+
+def search_filters(key, fields):
+    """Search box over one of `fields`, returned as a `<field>_like` filter"""
+    field_col, query_col = st.columns([1, 3])
+    with field_col:
+        field = st.selectbox("Search in", fields, key=f"{key}_search_field")
+    with query_col:
+        query = st.text_input("Search", key=f"{key}_search").strip()
+    # % and _ typed in the box are matched literally, not as wildcards
+    return {f"{field}_like": f"%{escape_like(query)}%"} if query else {}
+
+def paged_table(key, loader, filters=None):
+    """Show one page of a table at a time; only the visible page is fetched"""
+    filters = filters or {}
+    limit = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_limit")
+    state = st.session_state.setdefault(f"{key}_pages", {"cursors": [None], "view": None})
+    if state["view"] != (limit, filters):
+        # New page size or search: start again from the first page
+        state["cursors"] = [None]
+        state["view"] = (limit, filters)
+    result = cached(loader, limit, state["cursors"][-1], filters)
+    if not result["success"]:
+        st.error(result["message"])
+        return
+    # Interactive grid: columns sort on click, rows are virtualized by the browser
+    st.dataframe(result["data"], hide_index=True)
+    page = len(state["cursors"])
+    prev_col, info_col, next_col = st.columns([1, 6, 1])
+    with prev_col:
+        if st.button("◀ Previous", key=f"{key}_prev", disabled=page == 1):
+            state["cursors"].pop()
+            st.rerun()
+    with info_col:
+        st.caption(f"Page {page} · {len(result['data'])} rows")
+    with next_col:
+        if st.button("Next ▶", key=f"{key}_next", disabled=result["next_cursor"] is None):
+            state["cursors"].append(result["next_cursor"])
+            st.rerun()
+
+def show_result(result, *loaders):
+    """Show the outcome of a write and clear the cached reads it affects"""
+    if result["success"]:
+        for loader in loaders:
+            loader.clear()
+        st.success(result["message"])
+    else:
+        st.error(result["message"])
+
 # ---- Session State for Navigation ----
 if "page" not in st.session_state:
     st.session_state.page = "Home"
 
 # ---- Header Navigation ----
-header_cols = st.columns([1, 6, 1, 1, 1, 1])
+header_cols = st.columns([1, 5, 1, 1, 1, 1, 1])
 with header_cols[0]:
     if st.button(" Home "):
         st.session_state.page = "Home"
@@ -33,6 +127,9 @@ with header_cols[4]:
 with header_cols[5]:
     if st.button("Tracking"):
         st.session_state.page = "Tracking"
+with header_cols[6]:
+    if st.button("Analytics"):
+        st.session_state.page = "Analytics"
 
 st.markdown("---")
 
@@ -104,16 +201,14 @@ if st.session_state.page == "Home":
     with right_col:
         st.markdown("### Quick Stats")
         
-        # Fetch data from your DatabaseManager directly
-        customers_res = customer_mgr.db.get_customers()
-        couriers_res = courier_mgr.db.get_couriers()
-        parcels_res = parcel_mgr.db.get_parcels()
-
-        total_customers = len(customers_res) if customers_res else 0
-        total_couriers = len(couriers_res) if couriers_res else 0
-        total_parcels = len(parcels_res) if parcels_res else 0
-        in_transit = sum(1 for p in parcels_res if p.get("status") == "In Transit") if parcels_res else 0
-        delivered = sum(1 for p in parcels_res if p.get("status") == "Delivered") if parcels_res else 0
+        # Counts are computed by the database, not by downloading the tables
+        stats = cached(load_stats)["data"]
+        by_status = stats.get("parcels_by_status", {})
+        total_customers = stats.get("customers", 0)
+        total_couriers = stats.get("couriers", 0)
+        total_parcels = stats.get("parcels", 0)
+        in_transit = by_status.get("In Transit", 0)
+        delivered = by_status.get("Delivered", 0)
 
         st.metric("Total Customers", total_customers)
         st.metric("Total Couriers", total_couriers)
@@ -135,18 +230,11 @@ elif st.session_state.page == "Customers":
         phone = st.text_input("Phone")
         address = st.text_input("Address")
         if st.button("Save Customer"):
-            result = customer_mgr.add(name, email, phone, address)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(customer_mgr.add(name, email, phone, address), load_customers, load_stats)
 
     elif action == "View All":
-        data = customer_mgr.get_all()
-        if data["success"]:
-            st.table(data["data"])
-        else:
-            st.error(data["message"])
+        filters = search_filters("customers", ["name", "email", "phone"])
+        paged_table("customers", load_customers, filters)
 
     elif action == "Update":
         cust_id = st.text_input("Customer ID")
@@ -157,22 +245,14 @@ elif st.session_state.page == "Customers":
         phone = st.text_input("New Phone")
         address = st.text_input("New Address")
         if st.button("Update Customer"):
-            result = customer_mgr.update(cust_id, name, email, phone, address)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(customer_mgr.update(cust_id, name, email, phone, address), load_customers)
 
     elif action == "Delete":
         cust_id = st.text_input("Customer ID")
         if cust_id:
             cust_id = int(cust_id)  # <-- convert to int
         if st.button("Delete Customer"):
-            result = customer_mgr.delete(cust_id)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(customer_mgr.delete(cust_id), load_customers, load_parcels, load_tracking, load_stats)
 
 # ---------------- Couriers Page ----------------
 elif st.session_state.page == "Couriers":
@@ -184,18 +264,11 @@ elif st.session_state.page == "Couriers":
         phone = st.text_input("Phone")
         vehicle = st.text_input("Vehicle No.")
         if st.button("Save Courier"):
-            result = courier_mgr.add(name, phone, vehicle)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(courier_mgr.add(name, phone, vehicle), load_couriers, load_stats)
 
     elif action == "View All":
-        data = courier_mgr.get_all()
-        if data["success"]:
-            st.table(data["data"])
-        else:
-            st.error(data["message"])
+        filters = search_filters("couriers", ["name", "phone", "vehicle_no"])
+        paged_table("couriers", load_couriers, filters)
 
     elif action == "Update":
         courier_id = st.text_input("Courier ID")
@@ -205,22 +278,14 @@ elif st.session_state.page == "Couriers":
         phone = st.text_input("New Phone")
         vehicle = st.text_input("New Vehicle No.")
         if st.button("Update Courier"):
-            result = courier_mgr.update(courier_id, name, phone, vehicle)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(courier_mgr.update(courier_id, name, phone, vehicle), load_couriers)
 
     elif action == "Delete":
         courier_id = st.text_input("Courier ID")
         if courier_id:
             courier_id = int(courier_id)  # <-- convert to int
         if st.button("Delete Courier"):
-            result = courier_mgr.delete(courier_id)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(courier_mgr.delete(courier_id), load_couriers, load_tracking, load_stats)
 
 # ---------------- Parcels Page ----------------
 elif st.session_state.page == "Parcels":
@@ -236,18 +301,18 @@ elif st.session_state.page == "Parcels":
         weight = st.number_input("Weight (kg)", min_value=0.1)
         price = st.number_input("Price", min_value=1)
         if st.button("Save Parcel"):
-            result = parcel_mgr.add(sender_id, receiver_id, weight, price)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(parcel_mgr.add(sender_id, receiver_id, weight, price), load_parcels, load_stats)
 
     elif action == "View All":
-        data = parcel_mgr.get_all()
-        if data["success"]:
-            st.table(data["data"])
-        else:
-            st.error(data["message"])
+        status_col, sender_col, receiver_col = st.columns(3)
+        with status_col:
+            status = st.selectbox("Status", ["All", "Pending", "In Transit", "Delivered", "Cancelled"], key="parcels_status")
+        with sender_col:
+            sender_id = st.number_input("Sender ID", min_value=0, step=1, key="parcels_sender", help="0 = any")
+        with receiver_col:
+            receiver_id = st.number_input("Receiver ID", min_value=0, step=1, key="parcels_receiver", help="0 = any")
+        filters = {"status": None if status == "All" else status, "sender_id": sender_id or None, "receiver_id": receiver_id or None}
+        paged_table("parcels", load_parcels, {k: v for k, v in filters.items() if v is not None})
 
     elif action == "Update":
         parcel_id = st.text_input("Parcel ID")
@@ -255,22 +320,14 @@ elif st.session_state.page == "Parcels":
             parcel_id = int(parcel_id)  # <-- convert to int
         status = st.selectbox("Status", ["Pending", "In Transit", "Delivered"])
         if st.button("Update Parcel"):
-            result = parcel_mgr.update(parcel_id, status=status)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(parcel_mgr.update(parcel_id, status=status), load_parcels, load_stats)
 
     elif action == "Delete":
         parcel_id = st.text_input("Parcel ID")
         if parcel_id:
             parcel_id = int(parcel_id)  # <-- convert to int
         if st.button("Delete Parcel"):
-            result = parcel_mgr.delete(parcel_id)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(parcel_mgr.delete(parcel_id), load_parcels, load_tracking, load_stats)
 
 # ---------------- Tracking Page ----------------
 elif st.session_state.page == "Tracking":
@@ -286,20 +343,16 @@ elif st.session_state.page == "Tracking":
         location = st.text_input("Location")
         remarks = st.text_area("Remarks")
         if st.button("Save Tracking"):
-            result = tracking_mgr.add(parcel_id, courier_id, location, remarks)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(tracking_mgr.add(parcel_id, courier_id, location, remarks), load_tracking)
 
     elif action == "View by Parcel":
         parcel_id = st.text_input("Parcel ID")
         if parcel_id:
             parcel_id = int(parcel_id)  # <-- convert to int
         if st.button("View Tracking"):
-            result = tracking_mgr.get_by_parcel(parcel_id)
+            result = cached(load_tracking, parcel_id)
             if result["success"]:
-                st.table(result["data"])
+                st.dataframe(result["data"], hide_index=True)
             else:
                 st.error(result["message"])
 
@@ -310,22 +363,76 @@ elif st.session_state.page == "Tracking":
         location = st.text_input("New Location")
         remarks = st.text_area("New Remarks")
         if st.button("Update Tracking"):
-            result = tracking_mgr.update(track_id, location=location, remarks=remarks)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(tracking_mgr.update(track_id, location=location, remarks=remarks), load_tracking)
 
     elif action == "Delete Tracking":
         track_id = st.text_input("Tracking ID")
         if track_id:
             track_id = int(track_id)  # <-- convert to int
         if st.button("Delete Tracking"):
-            result = tracking_mgr.delete(track_id)
-            if result["success"]:
-                st.success(result["message"])
-            else:
-                st.error(result["message"])
+            show_result(tracking_mgr.delete(track_id), load_tracking)
+
+# ---------------- Analytics Page ----------------
+elif st.session_state.page == "Analytics":
+    st.subheader("📊 Parcel Analytics")
+    from_col, to_col = st.columns(2)
+    with from_col:
+        from_date = st.date_input("Created from", value=None, key="analytics_from")
+    with to_col:
+        to_date = st.date_input("Created to", value=None, key="analytics_to")
+    created_from = datetime.combine(from_date, time.min) if from_date else None
+    created_to = datetime.combine(to_date, time.max) if to_date else None
+    report = st.selectbox("Report", ["Daily Revenue", "Weight Distribution", "Top Senders", "Delivery Times"])
+
+    if report == "Daily Revenue":
+        result = cached(load_report, "revenue", created_from, created_to)
+        if result["success"]:
+            data = result["data"]
+            total_col, revenue_col = st.columns(2)
+            total_col.metric("Parcels", data["total_parcels"])
+            revenue_col.metric("Revenue", f"{data['total_revenue']:,.2f}")
+            if data["days"]:
+                st.line_chart(data["days"], x="date", y="revenue")
+            st.dataframe(data["days"], hide_index=True)
+        else:
+            st.error(result["message"])
+
+    elif report == "Weight Distribution":
+        result = cached(load_report, "weight", created_from, created_to)
+        if result["success"]:
+            data = result["data"]
+            if data["count"]:
+                mean_col, p50_col, p95_col, max_col = st.columns(4)
+                mean_col.metric("Mean kg", data["mean"])
+                p50_col.metric("Median kg", data["percentiles"]["p50"])
+                p95_col.metric("p95 kg", data["percentiles"]["p95"])
+                max_col.metric("Max kg", data["max"])
+            buckets = [{"weight (kg)": f"{b['from']:g}-{b['to']:g}" if b["to"] is not None else f"{b['from']:g}+",
+                        "parcels": b["parcels"]} for b in data["histogram"]]
+            st.bar_chart(buckets, x="weight (kg)", y="parcels")
+        else:
+            st.error(result["message"])
+
+    elif report == "Top Senders":
+        limit = st.slider("Senders", 5, 100, 20)
+        result = cached(load_report, "senders", created_from, created_to, limit=limit)
+        if result["success"]:
+            st.caption(f"{result['data']['total_senders']} senders in range")
+            st.dataframe(result["data"]["senders"], hide_index=True)
+        else:
+            st.error(result["message"])
+
+    elif report == "Delivery Times":
+        result = cached(load_report, "delivery", created_from, created_to)
+        if result["success"]:
+            data = result["data"]
+            st.caption(f"{data['measured']} of {data['delivered']} delivered parcels have tracking scans")
+            if data.get("hours"):
+                cols = st.columns(5)
+                for col, key in zip(cols, ["p50", "p75", "p90", "p95", "p99"]):
+                    col.metric(f"{key} hours", data["hours"][key])
+        else:
+            st.error(result["message"])
 
 st.markdown(
     "<div style='text-align: center; padding: 10px; color: #555;'>© 2025 Parcel Tracking System</div>",
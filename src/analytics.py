@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from src.cache import TTLCache, table_versions
+from src.db import DatabaseManager, AsyncDatabaseManager, KeysetPages, PARCEL_STATUSES, steps
+
+'''Revenue, weight, sender and delivery-time reports over columnar pandas frames of parcels and tracking'''
+
+load_dotenv()
+# Seconds loaded frames are reused; writes through this process reload them straight away
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+# Pages are converted to typed columns in batches of this many rows (fewer, larger pandas calls)
+ANALYTICS_BATCH_ROWS = 50000
+
+PARCEL_FIELDS = ["parcel_id", "sender_id", "weight", "price", "status", "created_at"]
+TRACKING_FIELDS = ["tracking_id", "parcel_id", "timestamp"]
+WEIGHT_BINS = [0, 1, 2, 5, 10, 20, 30, 50]
+PERCENTILES = [50, 75, 90, 95, 99]
+
+frame_cache = TTLCache(maxsize=1, ttl=ANALYTICS_CACHE_TTL)
+
+
+# ----- Frame Building -----
+def parcel_batch(rows):
+    """A batch of parcel rows as a typed column frame"""
+    frame = pd.DataFrame.from_records(rows, columns=PARCEL_FIELDS)
+    return pd.DataFrame({
+        "parcel_id": frame["parcel_id"].astype("int64"),
+        "sender_id": frame["sender_id"].astype("Int64"),
+        "weight": frame["weight"].astype("float64"),
+        "price": frame["price"].astype("float64"),
+        "status": pd.Categorical(frame["status"], categories=PARCEL_STATUSES),
+        "created_at": pd.to_datetime(frame["created_at"], utc=True, format="ISO8601"),
+    })
+
+def tracking_batch(rows):
+    """A batch of tracking rows reduced to first/last scan and event count per parcel"""
+    frame = pd.DataFrame.from_records(rows, columns=TRACKING_FIELDS)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True, format="ISO8601")
+    return frame.groupby("parcel_id")["timestamp"].agg(first_scan="min", last_scan="max", events="size")
+
+def parcel_frame(frames):
+    if not frames:
+        return parcel_batch([])
+    return pd.concat(frames, ignore_index=True)
+
+def tracking_frame(frames):
+    """Merge per-batch summaries; a parcel's events may span several batches"""
+    if not frames:
+        return tracking_batch([])
+    return pd.concat(frames).groupby(level=0).agg(first_scan=("first_scan", "min"), last_scan=("last_scan", "max"),
+                                                  events=("events", "sum"))
+
+
+# ----- Reports -----
+def utc(value):
+    """Timestamp in UTC; naive values are taken as UTC like the stored timestamps"""
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp.tz_convert("UTC")
+
+def in_range(parcels, created_from=None, created_to=None):
+    """Parcels created within [created_from, created_to]"""
+    mask = np.ones(len(parcels), dtype=bool)
+    if created_from is not None:
+        mask &= (parcels["created_at"] >= utc(created_from)).to_numpy()
+    if created_to is not None:
+        mask &= (parcels["created_at"] <= utc(created_to)).to_numpy()
+    return parcels[mask]
+
+def daily_revenue(parcels):
+    """Parcels, revenue and weight per creation day; cancelled parcels count as parcels but not revenue"""
+    billable = parcels["status"] != "Cancelled"
+    days = parcels.assign(day=parcels["created_at"].dt.floor("D"), cancelled=(~billable).astype("int64"),
+                          revenue=parcels["price"].where(billable, 0.0))
+    daily = days.groupby("day").agg(parcels=("parcel_id", "size"), cancelled=("cancelled", "sum"),
+                                    revenue=("revenue", "sum"), weight=("weight", "sum"))
+    daily["avg_price"] = daily["revenue"] / (daily["parcels"] - daily["cancelled"]).where(lambda n: n > 0)
+    daily = daily.round(2).fillna({"avg_price": 0.0}).reset_index()
+    daily["day"] = daily["day"].dt.strftime("%Y-%m-%d")
+    return {
+        "days": daily.rename(columns={"day": "date"}).to_dict("records"),
+        "total_parcels": int(len(parcels)),
+        "total_revenue": round(float(days["revenue"].sum()), 2),
+    }
+
+def weight_distribution(parcels, bins=WEIGHT_BINS):
+    """Summary statistics and a histogram of parcel weight; the last bucket is open-ended"""
+    weights = parcels["weight"].to_numpy()
+    edges = np.append(np.asarray(bins, dtype=float), np.inf)
+    counts, _ = np.histogram(weights, bins=edges)
+    summary = {"count": int(weights.size)}
+    if weights.size:
+        summary.update({
+            "mean": round(float(weights.mean()), 2),
+            "std": round(float(weights.std()), 2),
+            "min": round(float(weights.min()), 2),
+            "max": round(float(weights.max()), 2),
+            "percentiles": dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(weights, PERCENTILES).round(2).tolist())),
+        })
+    summary["histogram"] = [
+        {"from": float(low), "to": None if np.isinf(high) else float(high), "parcels": int(n)}
+        for low, high, n in zip(edges[:-1], edges[1:], counts)
+    ]
+    return summary
+
+def sender_volume(parcels, limit=20):
+    """Busiest senders by parcel count, with their weight and revenue"""
+    senders = parcels[parcels["sender_id"].notna()]
+    revenue = senders["price"].where(senders["status"] != "Cancelled", 0.0)
+    volume = senders.assign(revenue=revenue).groupby("sender_id").agg(
+        parcels=("parcel_id", "size"), weight=("weight", "sum"), revenue=("revenue", "sum"))
+    top = volume.sort_values(["parcels", "revenue"], ascending=False).head(int(limit)).round(2).reset_index()
+    return {"senders": top.astype({"sender_id": "int64"}).to_dict("records"), "total_senders": int(len(volume))}
+
+def delivery_times(parcels, tracking):
+    """Hours from creation to the last scan of delivered parcels, as percentiles"""
+    delivered = parcels.loc[parcels["status"] == "Delivered", ["parcel_id", "created_at"]]
+    scans = delivered.join(tracking["last_scan"], on="parcel_id", how="inner")
+    hours = ((scans["last_scan"] - scans["created_at"]).dt.total_seconds() / 3600).to_numpy()
+    hours = hours[hours >= 0]
+    result = {"delivered": int(len(delivered)), "measured": int(hours.size)}
+    if hours.size:
+        result["hours"] = {"mean": round(float(hours.mean()), 2), "max": round(float(hours.max()), 2),
+                           **dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(hours, PERCENTILES).round(2).tolist()))}
+    return result
+
+def run_report(name, parcels, tracking, created_from=None, created_to=None, **options):
+    parcels = in_range(parcels, created_from, created_to)
+    if name == "revenue":
+        return daily_revenue(parcels)
+    if name == "weight":
+        return weight_distribution(parcels)
+    if name == "senders":
+        return sender_volume(parcels, **options)
+    if name == "delivery":
+        return delivery_times(parcels, tracking)
+    raise ValueError(f"Unknown report: {name}")
+
+
+# ----- Analytics Operations -----
+class ParcelAnalytics:
+    """Loads parcels and tracking in keyset pages into frames (cached per table version) and runs the reports.
+
+    Written once as @steps generators, like the managers in logic.py: over an AsyncDatabaseManager every read is
+    awaited and frame building and aggregation run in a worker thread (db.offload).
+    """
+    def __init__(self, db=None, page_size=None):
+        self.db = db or DatabaseManager()
+        self.page_size = page_size
+        self.lock = threading.Lock()
+
+    def _run(self, gen):
+        return self.db._run(gen)
+
+    def read_pages(self, getter, key, fields, build):
+        """Page through a table, building a column frame per ANALYTICS_BATCH_ROWS rows (use with `yield from`)"""
+        frames, batch = [], []
+        pages = KeysetPages(getter, key, fields, page_size=self.page_size)
+        for read in pages:
+            batch.extend(pages.page((yield read)))
+            if batch and (len(batch) >= ANALYTICS_BATCH_ROWS or pages.done):
+                frames.append((yield self.db.offload(build, batch)))
+                batch = []
+        return frames
+
+    @steps
+    def load(self):
+        """Parcel and tracking frames, reloaded when either table was written since the last load"""
+        version = table_versions.get(("parcels", "tracking"))[0]
+        yield self.lock.acquire()
+        try:
+            cached = frame_cache.get(version)
+            if cached is None:
+                parcel_frames = yield from self.read_pages(self.db.get_parcels, "parcel_id", PARCEL_FIELDS, parcel_batch)
+                tracking_frames = yield from self.read_pages(self.db.get_tracking_page, "tracking_id", TRACKING_FIELDS, tracking_batch)
+                cached = tuple((yield self.db._gather(self.db.offload(parcel_frame, parcel_frames),
+                                                      self.db.offload(tracking_frame, tracking_frames))))
+                frame_cache.set(version, cached)
+            return cached
+        finally:
+            self.lock.release()
+
+    @steps
+    def report(self, name, created_from=None, created_to=None, **options):
+        try:
+            parcels, tracking = yield self.load()
+            data = yield self.db.offload(run_report, name, parcels, tracking, created_from, created_to, **options)
+            return {"success": True, "data": data}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+
+class AsyncParcelAnalytics(ParcelAnalytics):
+    """Same reports for the API; only the database and the lock differ"""
+    def __init__(self, db=None, page_size=None):
+        super().__init__(db or AsyncDatabaseManager(), page_size)
+        self.lock = asyncio.Lock()
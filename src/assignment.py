@@ -0,0 +1,71 @@
+import heapq
+import os
+from dotenv import load_dotenv
+
+'''Courier assignment for pending parcels: least-loaded-first scheduling over a heap of couriers'''
+
+load_dotenv()
+# Rows per upsert when saving a run (reads use the keyset pages of src.db)
+ASSIGNMENT_CHUNK_SIZE = int(os.getenv("ASSIGNMENT_CHUNK_SIZE", "2000"))
+
+
+def split_pending(parcels, assignments, reassign=False):
+    """Pending parcels still to assign as (parcel_id, weight) pairs, and the courier loads of the ones already assigned.
+
+    Loads are {courier_id: [parcels, weight]}; assignments of parcels that are no longer pending are ignored.
+    """
+    weights = {p["parcel_id"]: float(p["weight"]) for p in parcels}
+    loads = {}
+    if not reassign:
+        for row in assignments:
+            weight = weights.pop(row["parcel_id"], None)
+            if weight is not None:
+                load = loads.setdefault(row["courier_id"], [0, 0.0])
+                load[0] += 1
+                load[1] += weight
+    return list(weights.items()), loads
+
+
+def plan_assignments(parcels, couriers, loads=None, weight_factor=1.0, max_parcels=None):
+    """Assign (parcel_id, weight) pairs to courier ids, keeping courier loads balanced.
+
+    A courier's load is its parcel count plus `weight_factor` times its weight in units of the mean parcel
+    weight, so count and weight pull equally by default. Heaviest parcels go first, each to the least-loaded
+    courier (LPT scheduling): O(P log P + P log C). Couriers stop taking parcels at `max_parcels`.
+    Returns ({parcel_id: courier_id}, {courier_id: [parcels, weight]}).
+    """
+    loads = {courier_id: list((loads or {}).get(courier_id, (0, 0.0))) for courier_id in couriers}
+    count = len(parcels) + sum(n for n, _ in loads.values())
+    weight = sum(w for _, w in parcels) + sum(w for _, w in loads.values())
+    unit = weight_factor * count / weight if weight > 0 else 0.0
+    heap = [(n + w * unit, courier_id) for courier_id, (n, w) in loads.items() if max_parcels is None or n < max_parcels]
+    heapq.heapify(heap)
+    plan = {}
+    for parcel_id, parcel_weight in sorted(parcels, key=lambda p: p[1], reverse=True):
+        if not heap:
+            break
+        load, courier_id = heap[0]
+        courier = loads[courier_id]
+        courier[0] += 1
+        courier[1] += parcel_weight
+        plan[parcel_id] = courier_id
+        if max_parcels is None or courier[0] < max_parcels:
+            heapq.heapreplace(heap, (load + 1 + parcel_weight * unit, courier_id))
+        else:
+            heapq.heappop(heap)
+    return plan, loads
+
+
+def load_summary(loads):
+    """Spread of parcels and weight across couriers after a run"""
+    if not loads:
+        return {"couriers": 0}
+    counts = [n for n, _ in loads.values()]
+    weights = [w for _, w in loads.values()]
+    return {
+        "couriers": len(loads),
+        "min_parcels": min(counts),
+        "max_parcels": max(counts),
+        "min_weight": round(min(weights), 2),
+        "max_weight": round(max(weights), 2),
+    }
@@ -0,0 +1,36 @@
+import asyncio
+from src.db import AsyncDatabaseManager
+from src.logic import CustomerManager, CourierManager, ParcelManager, TrackingManager, StatsManager, AssignmentManager
+
+'''Async managers for the FastAPI endpoints: the managers of logic.py over an AsyncDatabaseManager, so every
+operation returns an awaitable. Behaviour lives in logic.py; only the database and the locks differ here.'''
+
+class AsyncCustomerManager(CustomerManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+
+
+class AsyncCourierManager(CourierManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+
+
+class AsyncParcelManager(ParcelManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+
+
+class AsyncTrackingManager(TrackingManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+
+
+class AsyncStatsManager(StatsManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+
+
+class AsyncAssignmentManager(AssignmentManager):
+    def __init__(self):
+        super().__init__(AsyncDatabaseManager())
+        self.lock = asyncio.Lock()
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+'''In-process read-through cache used by the managers for rarely changing reads'''
+
+load_dotenv()
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after being stored; ttl=0 disables it"""
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0  # bumped by every invalidation, see token()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def token(self):
+        """Take before a read-through database read and pass to set(), so a fill that overlapped a write is dropped"""
+        with self.lock:
+            return self.generation
+
+    def set(self, key, value, token=None):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self.lock:
+            if token is not None and token != self.generation:
+                # Invalidated while the value was being read: it may predate that write
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+class TableVersions:
+    """Per-table write counters, bumped by the managers and used by the API for ETag / Last-Modified"""
+    def __init__(self):
+        self.started = time.time()
+        self.versions = {}
+        self.modified = {}
+        self.lock = threading.Lock()
+
+    def bump(self, *tables):
+        now = time.time()
+        with self.lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+                self.modified[table] = now
+
+    def get(self, tables):
+        """Version tuple of the given tables and the time of their latest write (process start if none)"""
+        with self.lock:
+            return (tuple(self.versions.get(t, 0) for t in tables),
+                    max(self.modified.get(t, self.started) for t in tables))
+
+
+# Caches shared by the sync and async managers of this process
+customer_cache = TTLCache()
+courier_cache = TTLCache()
+tracking_cache = TTLCache()
+table_versions = TableVersions()
+
+def cache_stats():
+    return {
+        "customers": customer_cache.stats(),
+        "couriers": courier_cache.stats(),
+        "tracking": tracking_cache.stats(),
+    }
@@ -1,21 +1,350 @@
 import os
-from supabase import create_client, Client
+import asyncio
+import functools
+import inspect
+import sqlite3
+import threading
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
+from src.metrics import instrumented, registry
 
 # Load env variables
 load_dotenv()
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
+backend = os.getenv("DB_BACKEND", "supabase").lower()
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def create_db_client():
+    """Create the client for the backend selected by DB_BACKEND (supabase or sqlite)"""
+    if backend == "sqlite":
+        from src.sqlite_client import SQLiteClient
+        path = os.getenv("SQLITE_PATH", "parcels.db")
+        if path != ":memory:" and not os.path.isabs(path):
+            path = os.path.join(ROOT_DIR, path)
+        return SQLiteClient(path)
+    from supabase import create_client
+    return create_client(*supabase_config())
+
+def supabase_config():
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in .env (or use DB_BACKEND=sqlite)")
+    return url, key
+
+PARCEL_STATUSES = ["Pending", "In Transit", "Delivered", "Cancelled"]
+# Tracking rollups: bucket sizes and what the scans are counted per
+ROLLUP_PERIODS = ["hour", "day"]
+ROLLUP_DIMENSIONS = ["courier", "location"]
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# Rows per keyset page wherever a whole table or result set is read; keep it at or below the PostgREST max-rows
+# setting (1000 on Supabase), or the server truncates pages and the read stops early
+PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "1000"))
+
+# Columns that may be projected with `fields`, and filter name -> (column, operator) per table
+TABLE_COLUMNS = {
+    "customers": ["customer_id", "name", "email", "phone", "address"],
+    "couriers": ["courier_id", "name", "phone", "vehicle_no"],
+    "parcels": ["parcel_id", "sender_id", "receiver_id", "weight", "price", "status", "created_at"],
+    "tracking": ["tracking_id", "parcel_id", "courier_id", "location", "timestamp", "remarks"],
+    "assignments": ["parcel_id", "courier_id", "assigned_at"],
+}
+TABLE_FILTERS = {
+    "customers": {
+        "name": ("name", "eq"), "email": ("email", "eq"), "phone": ("phone", "eq"),
+        "name_like": ("name", "ilike"), "email_like": ("email", "ilike"), "phone_like": ("phone", "ilike"),
+    },
+    "couriers": {
+        "name": ("name", "eq"), "phone": ("phone", "eq"), "vehicle_no": ("vehicle_no", "eq"),
+        "name_like": ("name", "ilike"), "phone_like": ("phone", "ilike"), "vehicle_no_like": ("vehicle_no", "ilike"),
+    },
+    "parcels": {
+        "status": ("status", "eq"),
+        "sender_id": ("sender_id", "eq"),
+        "receiver_id": ("receiver_id", "eq"),
+        "created_from": ("created_at", "gte"),
+        "created_to": ("created_at", "lte"),
+        "min_weight": ("weight", "gte"),
+        "max_weight": ("weight", "lte"),
+        "min_price": ("price", "gte"),
+        "max_price": ("price", "lte"),
+    },
+    "tracking": {},
+    "assignments": {"courier_id": ("courier_id", "eq")},
+}
+
+def escape_like(text):
+    """`text` as a literal inside an ilike pattern: backslash-escape the wildcards % and _ (and backslash itself)"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# Sender and receiver embedded through the parcels foreign keys (PostgREST resource embedding)
+PARCEL_EXPAND = "*, sender:customers!parcels_sender_id_fkey(*), receiver:customers!parcels_receiver_id_fkey(*)"
+
+# Database client, created on first use and shared by every DatabaseManager of the process
+default_client = None
+client_lock = threading.Lock()
+
+def get_client():
+    global default_client
+    if default_client is None:
+        with client_lock:
+            if default_client is None:
+                default_client = create_db_client()
+    return default_client
+
+def close_client():
+    """Close the shared client (SQLite connection); the next use creates a new one"""
+    global default_client
+    with client_lock:
+        if default_client is not None and hasattr(default_client, "close"):
+            default_client.close()
+        default_client = None
+
+# Async client, shared by every AsyncDatabaseManager (one pooled HTTP connection per process)
+async_client = None
+async_http = None
+
+async def init_async_client():
+    """Create the shared async client; called once from the API lifespan"""
+    global async_client, async_http
+    if async_client is None:
+        if backend == "sqlite":
+            from src.sqlite_client import AsyncSQLiteClient
+            async_client = AsyncSQLiteClient(get_client())
+        else:
+            import httpx
+            from supabase import acreate_client, AsyncClientOptions
+            pool_size = int(os.getenv("DB_POOL_SIZE", "100"))
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            async_http = httpx.AsyncClient(limits=limits, timeout=30)
+            options = AsyncClientOptions(httpx_client=async_http)
+            async_client = await acreate_client(*supabase_config(), options)
+    return async_client
+
+async def close_async_client():
+    """Close the shared async client and its connection pool"""
+    global async_client, async_http
+    if async_http is not None:
+        await async_http.aclose()
+    async_client = None
+    async_http = None
+
+# ----- Bulk write errors -----
+class InsertInterrupted(Exception):
+    """insert_many stopped because the database could not be reached; `results` covers the rows handled before"""
+    def __init__(self, results, error):
+        super().__init__(str(error))
+        self.results = results
+
+def is_rejected(error):
+    """True when the database refused the row itself (constraint or data error), so retrying cannot help.
+
+    Anything else (connection error, timeout, locked or unavailable database) means the row was not looked at.
+    """
+    if isinstance(error, (sqlite3.IntegrityError, sqlite3.DataError, ValueError)):
+        return True
+    # PostgREST APIError carries the Postgres SQLSTATE: class 22 is a data exception, 23 a constraint violation
+    return str(getattr(error, "code", "") or "")[:2] in ("22", "23")
+
+
+# ----- Timestamps -----
+def db_timestamp(value):
+    """ISO text of a datetime as the database stores it (naive UTC), so it compares correctly with stored values"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+# ----- Steps (one body for the sync and async paths) -----
+def steps(func):
+    """Write a method as a generator that yields database calls and receives their results.
+
+    The method's object runs it with `self._run`: DatabaseManager sends every result straight back (the call has
+    already run), AsyncDatabaseManager awaits it first. Used by DatabaseManager and by the managers in logic.py.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self._run(func(self, *args, **kwargs))
+    return wrapper
+
+def run_steps(gen):
+    try:
+        step = gen.send(None)
+        while True:
+            step = gen.send(step)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        gen.close()
+
+async def run_steps_async(gen):
+    """Await each yielded awaitable and send its result back, or throw its exception into the generator"""
+    try:
+        step = gen.send(None)
+        while True:
+            try:
+                value = (await step) if inspect.isawaitable(step) else step
+            except Exception as e:
+                step = gen.throw(e)
+            else:
+                step = gen.send(value)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        gen.close()
+
+
+class KeysetPages:
+    """Keyset pagination: `read(page_size, after, *args)` for each page, after the last key of the previous one.
+
+    Iterating yields the read of the next page (its rows, or an awaitable over an async manager); hand each page
+    back with page() to move the cursor. Ends after a short page:
+
+        pages = KeysetPages(db.get_parcels, "parcel_id", fields)
+        for read in pages:
+            rows = pages.page((yield read))  # `await read` outside a @steps method
+    """
+    def __init__(self, read, key, *args, page_size=None):
+        self.read = read
+        self.key = key
+        self.args = args
+        self.page_size = page_size or PAGE_SIZE
+        self.after = None
+        self.done = False
+
+    def __iter__(self):
+        while not self.done:
+            self.done = True  # until page() sees a full page
+            yield self.read(self.page_size, self.after, *self.args)
+
+    def page(self, rows):
+        self.done = len(rows) < self.page_size
+        if rows:
+            self.after = rows[-1][self.key]
+        return rows
+
+def read_all(read, key, *args, page_size=None):
+    """Every row, read in keyset pages (in a @steps method: `rows = yield from read_all(...)`)"""
+    rows = []
+    pages = KeysetPages(read, key, *args, page_size=page_size)
+    for call in pages:
+        rows.extend(pages.page((yield call)))
+    return rows
 
-# Supabase client
-supabase: Client = create_client(url, key)
 
 class DatabaseManager:
-    def __init__(self):
-        pass
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    # ----- Execution hooks (overridden by AsyncDatabaseManager) -----
+    def _execute(self, query):
+        return query.execute()
+
+    def _fetch(self, query):
+        return query.execute().data
+
+    def _count(self, query):
+        return query.execute().count or 0
+
+    def _run(self, gen):
+        """Run a @steps generator to completion"""
+        return run_steps(gen)
+
+    def _gather(self, *results):
+        """Results of several calls (the async version runs them concurrently)"""
+        return list(results)
+
+    def offload(self, func, *args, **kwargs):
+        """Run CPU-bound work (the async version runs it on a worker thread)"""
+        return func(*args, **kwargs)
+
+    def _select_page(self, table, key, limit=None, after=None, fields=None, filters=None):
+        """Select rows ordered by primary key, optionally one keyset page after the given key.
+
+        `fields` projects columns (the key is always included for the cursor) and `filters`
+        maps names from TABLE_FILTERS to values; both are pushed down into the query.
+        """
+        columns = "*"
+        if fields:
+            unknown = [f for f in fields if f not in TABLE_COLUMNS[table]]
+            if unknown:
+                raise ValueError(f"Unknown field(s) for {table}: {', '.join(unknown)}")
+            columns = ",".join(dict.fromkeys([key, *fields]))
+        query = self.client.table(table).select(columns).order(key)
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name not in TABLE_FILTERS[table]:
+                raise ValueError(f"Unknown filter for {table}: {name}")
+            column, operator = TABLE_FILTERS[table][name]
+            query = getattr(query, operator)(column, value)
+        if after is not None:
+            query = query.gt(key, int(after))
+        if limit:
+            query = query.limit(int(limit))
+        return self._fetch(query)
+
+    @instrumented(None, "count")
+    def count_rows(self, table, **filters):
+        """Count rows matching equality filters without fetching them"""
+        query = self.client.table(table).select("*", count="exact", head=True)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return self._count(query)
+
+    @instrumented(None, "insert_many")
+    @steps
+    def insert_many(self, table, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Insert rows with one multi-row insert per chunk; a rejected chunk is retried row by row to isolate bad rows.
+
+        Only rows the database rejected are reported as failed, each counted in db_errors_total. Any other error
+        raises InsertInterrupted, which carries the results of the rows handled so far; the remaining rows were not written.
+        """
+        results = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                inserted = yield self._fetch(self.client.table(table).insert(chunk))
+                results.extend({"success": True, "data": row} for row in inserted)
+            except Exception as e:
+                if not is_rejected(e):
+                    raise InsertInterrupted(results, e) from e
+                # Handled here rather than raised, so count each rejected chunk and row like a failed call
+                registry.inc("db_errors_total", {"table": table, "operation": "insert_many"})
+                for row in chunk:
+                    try:
+                        inserted = yield self._fetch(self.client.table(table).insert(row))
+                        results.append({"success": True, "data": inserted[0]})
+                    except Exception as e:
+                        if not is_rejected(e):
+                            raise InsertInterrupted(results, e) from e
+                        registry.inc("db_errors_total", {"table": table, "operation": "insert_many"})
+                        results.append({"success": False, "message": str(e)})
+        return results
+
+    # ----- Stats -----
+    @steps
+    def get_stats(self):
+        """Get table counts and parcel counts per status"""
+        customers, couriers, parcels, *by_status = yield self._gather(
+            self.count_rows("customers"),
+            self.count_rows("couriers"),
+            self.count_rows("parcels"),
+            *(self.count_rows("parcels", status=status) for status in PARCEL_STATUSES),
+        )
+        return {
+            "customers": customers,
+            "couriers": couriers,
+            "parcels": parcels,
+            "parcels_by_status": dict(zip(PARCEL_STATUSES, by_status)),
+        }
 
     # ----- Customers -----
+    @instrumented("customers", "insert")
     def add_customer(self, name, email, phone, address):
         """Add customer"""
         data = {
@@ -24,12 +353,34 @@ class DatabaseManager:
             "phone": phone,
             "address": address
         }
-        return supabase.table("customers").insert(data).execute()
+        return self._execute(self.client.table("customers").insert(data))
 
-    def get_customers(self):
-        """Get customers"""
-        return supabase.table("customers").select("*").execute().data
+    def add_customers(self, customers):
+        """Add many customers, one result per customer"""
+        rows = [{
+            "name": c["name"],
+            "email": c["email"],
+            "phone": c["phone"],
+            "address": c["address"]
+        } for c in customers]
+        return self.insert_many("customers", rows)
 
+    @instrumented("customers", "select")
+    def get_customers(self, limit=None, after=None, fields=None, filters=None):
+        """Get customers, or a page of `limit` rows with customer_id greater than `after`"""
+        return self._select_page("customers", "customer_id", limit, after, fields, filters)
+
+    @instrumented("customers", "search")
+    def search_customers(self, q, limit=20):
+        """Ranked partial match on name, email, phone (trigram-indexed search_customers SQL function)"""
+        return self._fetch(self.client.rpc("search_customers", {"q": q, "max_rows": int(limit)}))
+
+    @instrumented("customers", "select")
+    def get_customer(self, customer_id):
+        """Get one customer by primary key"""
+        return self._fetch(self.client.table("customers").select("*").eq("customer_id", int(customer_id)).limit(1))
+
+    @instrumented("customers", "update")
     def update_customer(self, customer_id, name=None, email=None, phone=None, address=None):
         """Update customer"""
         data = {}
@@ -37,14 +388,16 @@ class DatabaseManager:
         if email: data["email"] = email
         if phone: data["phone"] = phone
         if address: data["address"] = address
-        return supabase.table("customers").update(data).eq("customer_id", int(customer_id)).execute()
+        return self._execute(self.client.table("customers").update(data).eq("customer_id", int(customer_id)))
 
+    @instrumented("customers", "delete")
     def delete_customer(self, customer_id):
         """Delete customer"""
-        return supabase.table("customers").delete().eq("customer_id", int(customer_id)).execute()
+        return self._execute(self.client.table("customers").delete().eq("customer_id", int(customer_id)))
 
 
     # ----- Couriers -----
+    @instrumented("couriers", "insert")
     def add_courier(self, name, phone, vehicle_no):
         """Add courier"""
         data = {
@@ -52,26 +405,40 @@ class DatabaseManager:
             "phone": phone,
             "vehicle_no": vehicle_no
         }
-        return supabase.table("couriers").insert(data).execute()
+        return self._execute(self.client.table("couriers").insert(data))
+
+    @instrumented("couriers", "select")
+    def get_couriers(self, limit=None, after=None, fields=None, filters=None):
+        """Get couriers, or a page of `limit` rows with courier_id greater than `after`"""
+        return self._select_page("couriers", "courier_id", limit, after, fields, filters)
+
+    @instrumented("couriers", "search")
+    def search_couriers(self, q, limit=20):
+        """Ranked partial match on name, phone, vehicle_no (trigram-indexed search_couriers SQL function)"""
+        return self._fetch(self.client.rpc("search_couriers", {"q": q, "max_rows": int(limit)}))
 
-    def get_couriers(self):
-        """Get couriers"""
-        return supabase.table("couriers").select("*").execute().data
+    @instrumented("couriers", "select")
+    def get_courier(self, courier_id):
+        """Get one courier by primary key"""
+        return self._fetch(self.client.table("couriers").select("*").eq("courier_id", int(courier_id)).limit(1))
 
+    @instrumented("couriers", "update")
     def update_courier(self, courier_id, name=None, phone=None, vehicle_no=None):
         """Update courier"""
         data = {}
         if name: data["name"] = name
         if phone: data["phone"] = phone
         if vehicle_no: data["vehicle_no"] = vehicle_no
-        return supabase.table("couriers").update(data).eq("courier_id", int(courier_id)).execute()
+        return self._execute(self.client.table("couriers").update(data).eq("courier_id", int(courier_id)))
 
+    @instrumented("couriers", "delete")
     def delete_courier(self, courier_id):
         """Delete courier"""
-        return supabase.table("couriers").delete().eq("courier_id", int(courier_id)).execute()
+        return self._execute(self.client.table("couriers").delete().eq("courier_id", int(courier_id)))
 
 
     # ----- Parcels -----
+    @instrumented("parcels", "insert")
     def add_parcel(self, sender_id, receiver_id, weight, price, status="Pending"):
         """Add parcel"""
         data = {
@@ -82,26 +449,71 @@ class DatabaseManager:
             "status": status,
             "created_at": datetime.now().isoformat()
         }
-        return supabase.table("parcels").insert(data).execute()
+        return self._execute(self.client.table("parcels").insert(data))
 
-    def get_parcels(self):
-        """Get parcels"""
-        return supabase.table("parcels").select("*").execute().data
+    def add_parcels(self, parcels):
+        """Add many parcels, one result per parcel"""
+        now = datetime.now().isoformat()
+        rows = [{
+            "sender_id": int(p["sender_id"]),
+            "receiver_id": int(p["receiver_id"]),
+            "weight": p["weight"],
+            "price": p["price"],
+            "status": p.get("status") or "Pending",
+            "created_at": now
+        } for p in parcels]
+        return self.insert_many("parcels", rows)
 
+    @instrumented("parcels", "select")
+    def get_parcels(self, limit=None, after=None, fields=None, filters=None):
+        """Get parcels, or a page of `limit` rows with parcel_id greater than `after`"""
+        return self._select_page("parcels", "parcel_id", limit, after, fields, filters)
+
+    @instrumented("parcels", "select")
+    def get_parcel(self, parcel_id, expand=False):
+        """Get one parcel by primary key; expand=True embeds sender and receiver in the same query"""
+        columns = PARCEL_EXPAND if expand else "*"
+        return self._fetch(self.client.table("parcels").select(columns).eq("parcel_id", int(parcel_id)).limit(1))
+
+    @instrumented("parcels", "update")
     def update_parcel(self, parcel_id, status=None, weight=None, price=None):
         """Update parcel"""
         data = {}
         if status: data["status"] = status
         if weight: data["weight"] = weight
         if price: data["price"] = price
-        return supabase.table("parcels").update(data).eq("parcel_id", int(parcel_id)).execute()
+        return self._execute(self.client.table("parcels").update(data).eq("parcel_id", int(parcel_id)))
 
+    @instrumented("parcels", "delete")
     def delete_parcel(self, parcel_id):
         """Delete parcel"""
-        return supabase.table("parcels").delete().eq("parcel_id", int(parcel_id)).execute()
+        return self._execute(self.client.table("parcels").delete().eq("parcel_id", int(parcel_id)))
+
+
+    # ----- Parcel status (latest status and tracking event per parcel, maintained by triggers) -----
+    @instrumented("parcel_status", "select")
+    def get_parcel_status(self, parcel_id):
+        """Get the summary row of one parcel"""
+        return self._fetch(self.client.table("parcel_status").select("*").eq("parcel_id", int(parcel_id)))
+
+
+    # ----- Scans -----
+    @instrumented("parcels", "scan")
+    def scan_parcel(self, parcel_id, courier_id, location, remarks="", status=None):
+        """Add a tracking event and apply a status transition in one transaction (scan_parcel SQL function)"""
+        params = {
+            "p_parcel_id": int(parcel_id),
+            "p_courier_id": int(courier_id),
+            "p_location": location,
+            "p_remarks": remarks or "",
+            "p_status": status,
+            "p_timestamp": datetime.now().isoformat(),
+        }
+        return self._fetch(self.client.rpc("scan_parcel", params))
 
 
     # ----- Tracking -----
+    @instrumented("tracking", "insert")
     def add_tracking(self, parcel_id, courier_id, location, remarks=""):
         """Add tracking"""
         data = {
@@ -111,19 +523,140 @@ class DatabaseManager:
             "timestamp": datetime.now().isoformat(),
             "remarks": remarks
         }
-        return supabase.table("tracking").insert(data).execute()
+        return self._execute(self.client.table("tracking").insert(data))
+
+    def add_tracking_many(self, events):
+        """Add many tracking events, one result per event"""
+        now = datetime.now().isoformat()
+        rows = [{
+            "parcel_id": int(t["parcel_id"]),
+            "courier_id": int(t["courier_id"]),
+            "location": t["location"],
+            "timestamp": t.get("timestamp") or now,
+            "remarks": t.get("remarks", "")
+        } for t in events]
+        return self.insert_many("tracking", rows)
+
+    @instrumented("tracking", "select")
+    def get_tracking_page(self, limit=None, after=None, fields=None):
+        """Get tracking events of all parcels, or a page of `limit` rows with tracking_id greater than `after`"""
+        return self._select_page("tracking", "tracking_id", limit, after, fields)
 
+    @instrumented("tracking", "select")
     def get_tracking(self, parcel_id):
-        """Get parcel tracking"""
-        return supabase.table("tracking").select("*").eq("parcel_id", int(parcel_id)).execute().data
+        """Get parcel tracking, oldest event first"""
+        return self._fetch(self.client.table("tracking").select("*").eq("parcel_id", int(parcel_id))
+                           .order("timestamp").order("tracking_id"))
 
+    @instrumented("tracking", "select")
+    @steps
+    def get_tracking_many(self, parcel_ids, limit=None):
+        """Get tracking of several parcels, ordered by parcel then timestamp; with `limit`, only each parcel's newest events.
+
+        Read in keyset pages on tracking_id until exhausted, so the server row cap never truncates a parcel's events.
+        """
+        ids = [int(p) for p in parcel_ids]
+
+        def read(page_size, after):
+            if limit:
+                return self._fetch(self.client.rpc("tracking_for_parcels", {"p_parcel_ids": ids, "p_limit": int(limit),
+                                                                            "p_after": after or 0, "p_page_size": page_size}))
+            return self._fetch(self.client.table("tracking").select("*").in_("parcel_id", ids).gt("tracking_id", after or 0)
+                               .order("tracking_id").limit(page_size))
+        rows = yield from read_all(read, "tracking_id")
+        rows.sort(key=lambda row: (row["parcel_id"], row["timestamp"] or "", row["tracking_id"]))
+        return rows
+
+    @instrumented("tracking", "update")
     def update_tracking(self, tracking_id, location=None, remarks=None):
         """Update tracking"""
         data = {}
         if location: data["location"] = location
         if remarks: data["remarks"] = remarks
-        return supabase.table("tracking").update(data).eq("tracking_id", int(tracking_id)).execute()
+        return self._execute(self.client.table("tracking").update(data).eq("tracking_id", int(tracking_id)))
 
+    @instrumented("tracking", "delete")
     def delete_tracking(self, tracking_id):
         """Delete tracking"""
-        return supabase.table("tracking").delete().eq("tracking_id", int(tracking_id)).execute()
+        return self._execute(self.client.table("tracking").delete().eq("tracking_id", int(tracking_id)))
+
+    # ----- Assignments (courier assigned to each pending parcel) -----
+    @instrumented("assignments", "select")
+    def get_assignments(self, limit=None, after=None, fields=None, filters=None):
+        """Get assignments, or a page of `limit` rows with parcel_id greater than `after`"""
+        return self._select_page("assignments", "parcel_id", limit, after, fields, filters)
+
+    @instrumented("assignments", "upsert")
+    @steps
+    def upsert_assignments(self, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Save {parcel_id, courier_id} rows with one multi-row upsert per chunk, replacing earlier assignments"""
+        now = datetime.now().isoformat()
+        for start in range(0, len(rows), chunk_size):
+            chunk = [{**row, "assigned_at": now} for row in rows[start:start + chunk_size]]
+            yield self._execute(self.client.table("assignments").upsert(chunk, on_conflict="parcel_id"))
+        return len(rows)
+
+    @instrumented("assignments", "delete")
+    @steps
+    def delete_assignments(self, parcel_ids, chunk_size=BULK_CHUNK_SIZE):
+        """Unassign parcels, one delete per chunk of ids"""
+        for start in range(0, len(parcel_ids), chunk_size):
+            yield self._execute(self.client.table("assignments").delete().in_("parcel_id", parcel_ids[start:start + chunk_size]))
+        return len(parcel_ids)
+
+    @instrumented("assignments", "release")
+    def release_stale_assignments(self):
+        """Unassign parcels that are no longer Pending, in one statement on the database"""
+        return self._fetch(self.client.rpc("release_stale_assignments", {}))
+
+    # ----- Tracking Rollups (maintained by triggers on tracking) -----
+    @instrumented("tracking_rollups", "select")
+    def get_tracking_rollups(self, period, dimension, start=None, end=None, key=None, limit=None):
+        """Scan counts per `period` bucket and courier/location in [start, end), oldest bucket first"""
+        query = (self.client.table("tracking_rollups").select("bucket,dimension_key,scans")
+                 .eq("period", period).eq("dimension", dimension).gt("scans", 0))
+        if start is not None:
+            query = query.gte("bucket", start)
+        if end is not None:
+            query = query.lt("bucket", end)
+        if key is not None:
+            query = query.eq("dimension_key", str(key))
+        query = query.order("bucket").order("dimension_key")
+        if limit:
+            query = query.limit(int(limit))
+        return self._fetch(query)
+
+    @instrumented("tracking_rollups", "backfill")
+    def backfill_tracking_rollups(self, start=None, end=None):
+        """Recompute the rollups of the days from start to end (all days when omitted) from the tracking table"""
+        return self._fetch(self.client.rpc("backfill_tracking_rollups", {"p_from": start, "p_to": end}))
+
+
+class AsyncDatabaseManager(DatabaseManager):
+    """Same operations as DatabaseManager, but every method returns an awaitable; only the execution hooks differ"""
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None and async_client is None:
+            raise RuntimeError("Async database client not initialized, call init_async_client() first")
+        return self._client or async_client
+
+    async def _execute(self, query):
+        return await query.execute()
+
+    async def _fetch(self, query):
+        return (await query.execute()).data
+
+    async def _count(self, query):
+        return (await query.execute()).count or 0
+
+    def _run(self, gen):
+        return run_steps_async(gen)
+
+    def _gather(self, *calls):
+        return asyncio.gather(*calls)
+
+    def offload(self, func, *args, **kwargs):
+        return asyncio.to_thread(func, *args, **kwargs)
@@ -0,0 +1,114 @@
+import asyncio
+import itertools
+import json
+import os
+from dotenv import load_dotenv
+from src.metrics import registry
+
+'''In-process publish/subscribe of tracking and status changes, streamed to clients as Server-Sent Events'''
+
+load_dotenv()
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+ALL_PARCELS = "*"
+
+
+class Subscription:
+    """One connected client: the parcels it follows and its bounded event queue"""
+    def __init__(self, topics, queue_size):
+        self.topics = topics
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            # Slow consumer: drop its oldest event instead of blocking the publisher
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """Fans each event out to the subscribers of its parcel and to the subscribers of all parcels"""
+    def __init__(self, queue_size=SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.topics = {}
+        self.sequence = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, parcel_ids=None):
+        subscription = Subscription(tuple(parcel_ids) if parcel_ids else (ALL_PARCELS,), self.queue_size)
+        for topic in subscription.topics:
+            self.topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for topic in subscription.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def publish(self, kind, parcel_id, data):
+        """Queue an event for every interested subscriber; never blocks (call from the event loop)"""
+        event = {"id": next(self.sequence), "event": kind, "data": data}
+        self.published += 1
+        for topic in (parcel_id, ALL_PARCELS):
+            for subscription in self.topics.get(topic, ()):
+                subscription.put(event)
+
+    def close(self):
+        """End every open stream, e.g. on shutdown"""
+        for subscribers in self.topics.values():
+            for subscription in subscribers:
+                subscription.put(None)
+
+    def stats(self):
+        subscriptions = {s for subscribers in self.topics.values() for s in subscribers}
+        return {
+            "subscribers": len(subscriptions),
+            "topics": len(self.topics),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def stream_events(subscription, heartbeat=15.0, max_age=None):
+    """SSE frames for one subscription: a ping every `heartbeat` seconds, closed after `max_age` so clients reconnect
+    and shutting-down workers are not held open"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age if max_age else None
+    while deadline is None or loop.time() < deadline:
+        timeout = heartbeat if deadline is None else max(0.0, min(heartbeat, deadline - loop.time()))
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            yield ": ping\n\n"
+            continue
+        if event is None:
+            return
+        yield format_sse(event)
+
+
+# ----- Publishing helpers used by the managers -----
+broker = EventBroker()
+
+def publish_tracking(events):
+    for event in events:
+        broker.publish("tracking", event["parcel_id"], event)
+
+def publish_status(parcel_id, status):
+    broker.publish("status", parcel_id, {"parcel_id": parcel_id, "status": status})
+
+
+def event_metrics():
+    stats = broker.stats()
+    yield ("sse_subscribers", "gauge", "Open live tracking streams", [({}, stats["subscribers"])])
+    yield ("sse_events_published_total", "counter", "Events published to live tracking streams", [({}, stats["published"])])
+    yield ("sse_events_dropped_total", "counter", "Events dropped for slow stream consumers", [({}, stats["dropped"])])
+
+registry.register_collector(event_metrics)
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import zlib
+from src.db import KeysetPages
+
+'''Streaming NDJSON/CSV exports that page through a table so memory stays flat'''
+
+EXPORTS = {
+    "parcels": ("get_parcels", "parcel_id",
+                ["parcel_id", "sender_id", "receiver_id", "weight", "price", "status", "created_at"]),
+    "tracking": ("get_tracking_page", "tracking_id",
+                 ["tracking_id", "parcel_id", "courier_id", "location", "timestamp", "remarks"]),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def iter_pages(db, table, page_size=None):
+    """Yield keyset pages of `table` from an AsyncDatabaseManager until the table is exhausted"""
+    getter, key, _ = EXPORTS[table]
+    pages = KeysetPages(getattr(db, getter), key, page_size=page_size)
+    for read in pages:
+        page = pages.page(await read)
+        if page:
+            yield page
+
+
+def format_ndjson(rows):
+    return "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+def format_csv(rows, columns, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_export(db, table, fmt="ndjson", gzip=False, page_size=None):
+    """Async generator of encoded (and optionally gzip-compressed) export chunks, one per page"""
+    columns = EXPORTS[table][2]
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    if fmt == "csv":
+        header = format_csv([], columns, header=True).encode()
+        yield compressor.compress(header) if compressor else header
+    async for page in iter_pages(db, table, page_size):
+        text = format_csv(page, columns) if fmt == "csv" else format_ndjson(page)
+        chunk = text.encode()
+        if compressor:
+            chunk = compressor.compress(chunk)
+            if not chunk:
+                continue
+        yield chunk
+    if compressor:
+        yield compressor.flush()
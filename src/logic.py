@@ -1,164 +1,578 @@
-from src.db import DatabaseManager
+import logging
+import threading
+import time
+from src.db import DatabaseManager, InsertInterrupted, ROLLUP_PERIODS, ROLLUP_DIMENSIONS, steps, read_all
+from src.cache import customer_cache, courier_cache, tracking_cache, table_versions
+from src.events import publish_tracking, publish_status
+from src.tracking_buffer import BufferFull
+from src.assignment import split_pending, plan_assignments, load_summary, ASSIGNMENT_CHUNK_SIZE
+
+'''Acts as a bridge between frontend (streamlit/FastAPI) and the database.
+
+Every operation is written once, as a @steps generator that yields database calls. With a DatabaseManager it
+runs synchronously (Streamlit); async_logic.py gives the same managers an AsyncDatabaseManager (FastAPI).
+'''
+
+logger = logging.getLogger(__name__)
+
+def next_cursor(data, key, limit):
+    """Cursor for the next keyset page, None when this page was the last one"""
+    if limit and data and len(data) == int(limit):
+        return data[-1][key]
+    return None
+
+def validate_bulk(items, required):
+    """Indexes of items with every required field, and a result list pre-filled with failures for the rest"""
+    valid, results = [], [None] * len(items)
+    for i, item in enumerate(items):
+        if any(item.get(field) in (None, "") for field in required):
+            results[i] = {"index": i, "success": False, "message": "All fields required"}
+        else:
+            valid.append(i)
+    return valid, results
+
+def bulk_response(valid, results, inserted):
+    """Merge per-row insert results into the per-item result list"""
+    for i, result in zip(valid, inserted):
+        results[i] = {"index": i, **result}
+    succeeded = sum(1 for r in results if r["success"])
+    return {"success": True, "inserted": succeeded, "failed": len(results) - succeeded, "results": results}
+
+def insert_failures(error, count):
+    """Per-row results of a bulk insert that raised; rows written before an InsertInterrupted keep their result"""
+    done = error.results if isinstance(error, InsertInterrupted) else []
+    return done + [{"success": False, "message": str(error)}] * (count - len(done))
+
+def any_inserted(inserted):
+    return any(r["success"] for r in inserted)
+
+def group_tracking(parcel_ids, events):
+    """Events grouped per parcel id, with an empty list for parcels without events"""
+    grouped = {parcel_id: [] for parcel_id in parcel_ids}
+    for event in events:
+        grouped.setdefault(event["parcel_id"], []).append(event)
+    return grouped
+
+def newest_events(events, limit):
+    """The `limit` most recent of a timestamp-ordered event list, still oldest first"""
+    return events[-int(limit):] if limit else events
+
+class Manager:
+    def __init__(self, db=None):
+        self.db = db or DatabaseManager()
+
+    def _run(self, gen):
+        return self.db._run(gen)
 
-'''Acts as a bridge between frontend (streamlit/FastAPI) and the database'''
 
 # ----- Customer Operations -----
-class CustomerManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+class CustomerManager(Manager):
 
+    @steps
     def add(self, name, email, phone, address):
         if not name or not email or not phone or not address:
             return {"success": False, "message": "All fields required"}
         try:
-            self.db.add_customer(name, email, phone, address)
+            yield self.db.add_customer(name, email, phone, address)
+            customer_cache.clear()
+            table_versions.bump("customers")
             return {"success": True, "message": "Customer added successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    @steps
+    def add_many(self, customers):
+        valid, results = validate_bulk(customers, ("name", "email", "phone", "address"))
+        try:
+            inserted = yield self.db.add_customers([customers[i] for i in valid])
+        except Exception as e:
+            inserted = insert_failures(e, len(valid))
+        if any_inserted(inserted):
+            customer_cache.clear()
+            table_versions.bump("customers")
+        return bulk_response(valid, results, inserted)
+
+    @steps
     def update(self, customer_id, name=None, email=None, phone=None, address=None):
         if not customer_id:
             return {"success": False, "message": "Customer ID required"}
         try:
-            self.db.update_customer(customer_id, name, email, phone, address)
+            yield self.db.update_customer(customer_id, name, email, phone, address)
+            customer_cache.clear()
+            table_versions.bump("customers")
             return {"success": True, "message": "Customer updated successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
-    def get_all(self):
+    @steps
+    def get_all(self, limit=None, after=None, fields=None, filters=None):
+        key = (limit, after, tuple(fields or ()), tuple(sorted((filters or {}).items())))
+        cached = customer_cache.get(key)
+        if cached is not None:
+            return cached
+        token = customer_cache.token()
         try:
-            data = self.db.get_customers()
-            return {"success": True, "data": data}
+            data = yield self.db.get_customers(limit, after, fields, filters)
+            result = {"success": True, "data": data, "next_cursor": next_cursor(data, "customer_id", limit)}
+            customer_cache.set(key, result, token)
+            return result
         except Exception as e:
             return {"success": False, "message": str(e), "data": []}
 
+    @steps
+    def search(self, q, limit=20):
+        q = (q or "").strip()
+        if not q:
+            return {"success": False, "message": "Search text required", "data": []}
+        key = ("search", q.lower(), limit)
+        cached = customer_cache.get(key)
+        if cached is not None:
+            return cached
+        token = customer_cache.token()
+        try:
+            result = {"success": True, "data": (yield self.db.search_customers(q, limit))}
+            customer_cache.set(key, result, token)
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": []}
+
+    @steps
+    def get(self, customer_id):
+        if not customer_id:
+            return {"success": False, "message": "Customer ID required", "data": None}
+        key = ("id", int(customer_id))
+        cached = customer_cache.get(key)
+        if cached is not None:
+            return cached
+        token = customer_cache.token()
+        try:
+            data = yield self.db.get_customer(customer_id)
+            result = {"success": True, "data": data[0] if data else None}
+            customer_cache.set(key, result, token)
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": None}
+
+    @steps
     def delete(self, customer_id):
         if not customer_id:
             return {"success": False, "message": "Customer ID required"}
         try:
-            self.db.delete_customer(customer_id)
+            yield self.db.delete_customer(customer_id)
+            customer_cache.clear()
+            tracking_cache.clear()  # parcels and their tracking cascade
+            table_versions.bump("customers", "parcels", "tracking", "assignments")
             return {"success": True, "message": "Customer deleted successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
 
 # ----- Courier Operations -----
-class CourierManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+class CourierManager(Manager):
 
+    @steps
     def add(self, name, phone, vehicle_no):
         if not name or not phone or not vehicle_no:
             return {"success": False, "message": "All fields required"}
         try:
-            self.db.add_courier(name, phone, vehicle_no)
+            yield self.db.add_courier(name, phone, vehicle_no)
+            courier_cache.clear()
+            table_versions.bump("couriers")
             return {"success": True, "message": "Courier added successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    @steps
     def update(self, courier_id, name=None, phone=None, vehicle_no=None):
         if not courier_id:
             return {"success": False, "message": "Courier ID required"}
         try:
-            self.db.update_courier(courier_id, name, phone, vehicle_no)
+            yield self.db.update_courier(courier_id, name, phone, vehicle_no)
+            courier_cache.clear()
+            table_versions.bump("couriers")
             return {"success": True, "message": "Courier updated successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
-    def get_all(self):
+    @steps
+    def get_all(self, limit=None, after=None, fields=None, filters=None):
+        key = (limit, after, tuple(fields or ()), tuple(sorted((filters or {}).items())))
+        cached = courier_cache.get(key)
+        if cached is not None:
+            return cached
+        token = courier_cache.token()
         try:
-            data = self.db.get_couriers()
-            return {"success": True, "data": data}
+            data = yield self.db.get_couriers(limit, after, fields, filters)
+            result = {"success": True, "data": data, "next_cursor": next_cursor(data, "courier_id", limit)}
+            courier_cache.set(key, result, token)
+            return result
         except Exception as e:
             return {"success": False, "message": str(e), "data": []}
 
+    @steps
+    def search(self, q, limit=20):
+        q = (q or "").strip()
+        if not q:
+            return {"success": False, "message": "Search text required", "data": []}
+        key = ("search", q.lower(), limit)
+        cached = courier_cache.get(key)
+        if cached is not None:
+            return cached
+        token = courier_cache.token()
+        try:
+            result = {"success": True, "data": (yield self.db.search_couriers(q, limit))}
+            courier_cache.set(key, result, token)
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": []}
+
+    @steps
+    def get(self, courier_id):
+        if not courier_id:
+            return {"success": False, "message": "Courier ID required", "data": None}
+        key = ("id", int(courier_id))
+        cached = courier_cache.get(key)
+        if cached is not None:
+            return cached
+        token = courier_cache.token()
+        try:
+            data = yield self.db.get_courier(courier_id)
+            result = {"success": True, "data": data[0] if data else None}
+            courier_cache.set(key, result, token)
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": None}
+
+    @steps
     def delete(self, courier_id):
         if not courier_id:
             return {"success": False, "message": "Courier ID required"}
         try:
-            self.db.delete_courier(courier_id)
+            yield self.db.delete_courier(courier_id)
+            courier_cache.clear()
+            tracking_cache.clear()  # tracking rows lose their courier_id
+            table_versions.bump("couriers", "tracking", "assignments")
             return {"success": True, "message": "Courier deleted successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
 
 # ----- Parcel Operations -----
-class ParcelManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+class ParcelManager(Manager):
 
+    @steps
     def add(self, sender_id, receiver_id, weight, price, status="Pending"):
         if not sender_id or not receiver_id or weight is None or price is None:
             return {"success": False, "message": "All fields required"}
         try:
-            self.db.add_parcel(sender_id, receiver_id, weight, price, status)
+            yield self.db.add_parcel(sender_id, receiver_id, weight, price, status)
+            table_versions.bump("parcels")
             return {"success": True, "message": "Parcel added successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    @steps
+    def add_many(self, parcels):
+        valid, results = validate_bulk(parcels, ("sender_id", "receiver_id", "weight", "price"))
+        try:
+            inserted = yield self.db.add_parcels([parcels[i] for i in valid])
+        except Exception as e:
+            inserted = insert_failures(e, len(valid))
+        if any_inserted(inserted):
+            table_versions.bump("parcels")
+        return bulk_response(valid, results, inserted)
+
+    @steps
     def update(self, parcel_id, sender_id=None, receiver_id=None, weight=None, price=None, status=None):
         if not parcel_id:
             return {"success": False, "message": "Parcel ID required"}
         try:
-            self.db.update_parcel(parcel_id, status, weight, price)
+            res = yield self.db.update_parcel(parcel_id, status, weight, price)
+            table_versions.bump("parcels")
+            if status:
+                table_versions.bump("assignments")  # released by the database trigger when the parcel left Pending
+                for row in res.data:
+                    publish_status(row["parcel_id"], row["status"])
             return {"success": True, "message": "Parcel updated successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
-    def get_all(self):
+    @steps
+    def scan(self, parcel_id, courier_id, location, remarks="", status=None):
+        """Record a scan and its status change atomically; `error` is not_found or invalid_transition on rejection"""
+        if not parcel_id or not courier_id or not location:
+            return {"success": False, "message": "All fields required"}
         try:
-            data = self.db.get_parcels()
-            return {"success": True, "data": data}
+            data = yield self.db.scan_parcel(parcel_id, courier_id, location, remarks, status)
+            if not data["success"]:
+                return {"success": False, "message": data["message"], "error": data["error"]}
+            tracking_cache.invalidate(int(parcel_id))
+            table_versions.bump("parcels", "tracking")
+            if data["status"] != data["previous_status"]:
+                table_versions.bump("assignments")  # released by the database trigger when the parcel left Pending
+            publish_tracking([data["tracking"]])
+            if data["status"] != data["previous_status"]:
+                publish_status(int(parcel_id), data["status"])
+            return {"success": True, "message": "Parcel scanned successfully",
+                    "data": {"tracking": data["tracking"], "status": data["status"], "previous_status": data["previous_status"]}}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @steps
+    def get_status(self, parcel_id):
+        if not parcel_id:
+            return {"success": False, "message": "Parcel ID required", "data": None}
+        try:
+            data = yield self.db.get_parcel_status(parcel_id)
+            return {"success": True, "data": data[0] if data else None}
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": None}
+
+    @steps
+    def get(self, parcel_id, expand=False):
+        if not parcel_id:
+            return {"success": False, "message": "Parcel ID required", "data": None}
+        try:
+            data = yield self.db.get_parcel(parcel_id, expand)
+            return {"success": True, "data": data[0] if data else None}
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": None}
+
+    @steps
+    def get_all(self, limit=None, after=None, fields=None, filters=None):
+        try:
+            data = yield self.db.get_parcels(limit, after, fields, filters)
+            return {"success": True, "data": data, "next_cursor": next_cursor(data, "parcel_id", limit)}
         except Exception as e:
             return {"success": False, "message": str(e), "data": []}
 
+    @steps
     def delete(self, parcel_id):
         if not parcel_id:
             return {"success": False, "message": "Parcel ID required"}
         try:
-            self.db.delete_parcel(parcel_id)
+            yield self.db.delete_parcel(parcel_id)
+            tracking_cache.invalidate(int(parcel_id))
+            table_versions.bump("parcels", "tracking", "assignments")
             return {"success": True, "message": "Parcel deleted successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
 
 # ----- Tracking Operations -----
-class TrackingManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+class TrackingManager(Manager):
+    def __init__(self, db=None):
+        super().__init__(db)
+        self.buffer = None  # TrackingBuffer when write-behind mode is enabled (API only)
 
+    @steps
     def add(self, parcel_id, courier_id, location, remarks=""):
         if not parcel_id or not courier_id or not location:
             return {"success": False, "message": "All fields required"}
+        if self.buffer:
+            try:
+                yield self.buffer.submit({"parcel_id": int(parcel_id), "courier_id": int(courier_id), "location": location, "remarks": remarks})
+                return {"success": True, "message": "Tracking queued", "queued": True}
+            except BufferFull as e:
+                return {"success": False, "message": str(e), "retry_after": 1}
+            except OSError as e:
+                return {"success": False, "message": f"Could not write the tracking spill file: {e}", "retry_after": 1}
         try:
-            self.db.add_tracking(parcel_id, courier_id, location, remarks)
-            return {"success": True, "message": "Tracking added successfully"}
+            res = yield self.db.add_tracking(parcel_id, courier_id, location, remarks)
         except Exception as e:
             return {"success": False, "message": str(e)}
+        self.tracking_added([{"success": True, "data": row} for row in res.data])
+        return {"success": True, "message": "Tracking added successfully"}
+
+    @steps
+    def add_many(self, events):
+        valid, results = validate_bulk(events, ("parcel_id", "courier_id", "location"))
+        try:
+            inserted = yield self.db.add_tracking_many([events[i] for i in valid])
+        except Exception as e:
+            inserted = insert_failures(e, len(valid))
+        self.tracking_added(inserted)
+        return bulk_response(valid, results, inserted)
 
+    @steps
+    def flush_buffered(self, events):
+        """Flush callback for the write-behind buffer; raises InsertInterrupted when the database is unavailable"""
+        try:
+            inserted = yield self.db.add_tracking_many(events)
+        except InsertInterrupted as e:
+            self.tracking_added(e.results)
+            raise
+        self.tracking_added(inserted)
+        return inserted
+
+    def tracking_added(self, inserted):
+        """Table version, cache and live events for inserted rows; never raises, the rows are already stored"""
+        added = [r["data"] for r in inserted if r["success"]]
+        if not added:
+            return
+        try:
+            table_versions.bump("tracking")
+            for event in added:
+                tracking_cache.invalidate(event["parcel_id"])
+            publish_tracking(added)
+        except Exception:
+            logger.exception("Bookkeeping failed after inserting %d tracking events", len(added))
+
+    @steps
     def update(self, tracking_id, parcel_id=None, courier_id=None, location=None, remarks=None):
         if not tracking_id:
             return {"success": False, "message": "Tracking ID required"}
         try:
-            self.db.update_tracking(tracking_id, location, remarks)
+            res = yield self.db.update_tracking(tracking_id, location, remarks)
+            table_versions.bump("tracking")
+            for row in res.data:
+                tracking_cache.invalidate(row["parcel_id"])
+            publish_tracking(res.data)
             return {"success": True, "message": "Tracking updated successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    @steps
     def get_by_parcel(self, parcel_id):
         if not parcel_id:
             return {"success": False, "message": "Parcel ID required", "data": []}
+        cached = tracking_cache.get(int(parcel_id))
+        if cached is not None:
+            return cached
+        token = tracking_cache.token()
+        try:
+            data = yield self.db.get_tracking(parcel_id)
+            result = {"success": True, "data": data}
+            tracking_cache.set(int(parcel_id), result, token)
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": []}
+
+    @steps
+    def get_by_parcels(self, parcel_ids, limit=None):
+        """Tracking of several parcels: cached parcels are served from memory, the rest read together.
+
+        With `limit` the database returns only each parcel's newest events, so those partial lists are not cached.
+        """
+        ids = list(dict.fromkeys(int(p) for p in parcel_ids or []))
+        if not ids:
+            return {"success": False, "message": "Parcel IDs required", "data": {}}
+        grouped, missing = {}, []
+        token = tracking_cache.token()
+        for parcel_id in ids:
+            cached = tracking_cache.get(parcel_id)
+            if cached is not None:
+                grouped[parcel_id] = cached["data"]
+            else:
+                missing.append(parcel_id)
+        try:
+            if missing:
+                fetched = group_tracking(missing, (yield self.db.get_tracking_many(missing, limit)))
+                if not limit:
+                    for parcel_id, events in fetched.items():
+                        tracking_cache.set(parcel_id, {"success": True, "data": events}, token)
+                grouped.update(fetched)
+            return {"success": True, "data": {parcel_id: newest_events(grouped[parcel_id], limit) for parcel_id in ids}}
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": {}}
+
+    @steps
+    def get_rollups(self, period="hour", dimension="courier", start=None, end=None, key=None, limit=None):
+        """Scan counts per hour/day and courier/location from the rollup table, O(buckets) instead of O(events)"""
+        if period not in ROLLUP_PERIODS or dimension not in ROLLUP_DIMENSIONS:
+            return {"success": False, "message": "Unknown rollup period or dimension", "data": []}
         try:
-            data = self.db.get_tracking(parcel_id)
+            data = yield self.db.get_tracking_rollups(period, dimension, start, end, key, limit)
             return {"success": True, "data": data}
         except Exception as e:
             return {"success": False, "message": str(e), "data": []}
 
+    @steps
+    def backfill_rollups(self, start=None, end=None):
+        """Rebuild the rollups of existing tracking events, for whole days from start to end (everything when omitted)"""
+        try:
+            data = yield self.db.backfill_tracking_rollups(start, end)
+            table_versions.bump("tracking_rollups")
+            return {"success": True, "message": f"Rebuilt {data['buckets']} rollup buckets", "buckets": data["buckets"]}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @steps
     def delete(self, tracking_id):
         if not tracking_id:
             return {"success": False, "message": "Tracking ID required"}
         try:
-            self.db.delete_tracking(tracking_id)
+            res = yield self.db.delete_tracking(tracking_id)
+            table_versions.bump("tracking")
+            for row in res.data:
+                tracking_cache.invalidate(row["parcel_id"])
             return {"success": True, "message": "Tracking deleted successfully"}
         except Exception as e:
             return {"success": False, "message": str(e)}
+
+
+# ----- Stats Operations -----
+class StatsManager(Manager):
+    @steps
+    def get(self):
+        try:
+            data = yield self.db.get_stats()
+            return {"success": True, "data": data}
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": {}}
+
+
+# ----- Assignment Operations -----
+class AssignmentManager(Manager):
+    def __init__(self, db=None):
+        super().__init__(db)
+        self.lock = threading.Lock()
+
+    @steps
+    def run(self, reassign=False, max_parcels=None, weight_factor=1.0):
+        """Assign pending parcels (only unassigned ones unless `reassign`) to the least-loaded couriers and save in bulk"""
+        try:
+            yield self.lock.acquire()
+            try:
+                started = time.perf_counter()
+                parcels = yield from read_all(self.db.get_parcels, "parcel_id", ["weight"], {"status": "Pending"})
+                couriers = [c["courier_id"] for c in (yield from read_all(self.db.get_couriers, "courier_id", ["courier_id"]))]
+                if not couriers:
+                    return {"success": False, "message": "No couriers to assign parcels to"}
+                current = [] if reassign else (yield from read_all(self.db.get_assignments, "parcel_id", ["courier_id"]))
+                loaded = time.perf_counter()
+                # CPU-bound for large runs, so the async path runs it off the event loop
+                todo, loads = yield self.db.offload(split_pending, parcels, current, reassign)
+                plan, loads = yield self.db.offload(plan_assignments, todo, couriers, loads, weight_factor, max_parcels)
+                planned = time.perf_counter()
+                yield self.db.upsert_assignments([{"parcel_id": p, "courier_id": c} for p, c in plan.items()], ASSIGNMENT_CHUNK_SIZE)
+                unplanned = [p for p, _ in todo if p not in plan]
+                if reassign and unplanned:
+                    # Parcels that no courier had room for this time lose their previous courier
+                    yield self.db.delete_assignments(unplanned)
+                # A parcel scanned after the pending read was planned anyway and the trigger has already run for it:
+                # release it now that the plan is saved (later status changes are released by the trigger)
+                released = (yield self.db.release_stale_assignments())["released"]
+                table_versions.bump("assignments")
+                done = time.perf_counter()
+            finally:
+                self.lock.release()
+            assigned = len(plan) - released
+            return {"success": True, "message": f"Assigned {assigned} parcels to {len(couriers)} couriers", "data": {
+                "pending": len(parcels),
+                "assigned": assigned,
+                "unassigned": len(todo) - len(plan),
+                "released": released,
+                "load": load_summary(loads),
+                "seconds": {"read": round(loaded - started, 3), "plan": round(planned - loaded, 3), "write": round(done - planned, 3)},
+            }}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @steps
+    def get_all(self, limit=None, after=None, filters=None):
+        try:
+            data = yield self.db.get_assignments(limit, after, None, filters)
+            return {"success": True, "data": data, "next_cursor": next_cursor(data, "parcel_id", limit)}
+        except Exception as e:
+            return {"success": False, "message": str(e), "data": []}
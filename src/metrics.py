@@ -0,0 +1,216 @@
+import functools
+from contextlib import contextmanager
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from dotenv import load_dotenv
+
+'''Request and database-call metrics, exported in the Prometheus text format'''
+
+load_dotenv()
+logger = logging.getLogger("parcels.slow")
+startup_logger = logging.getLogger("parcels.startup")
+SLOW_CALL_MS = float(os.getenv("SLOW_CALL_MS", "500"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by metric name and label set"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.descriptions = {}
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+
+    def describe(self, name, kind, text):
+        self.descriptions[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, collector):
+        """Add a callable returning (name, kind, help, [(labels, value), ...]) tuples, read at render time"""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            snapshots = [(key, list(h.counts), h.sum, h.count, h.buckets) for key, h in histograms]
+        seen = set()
+
+        def header(name):
+            if name not in seen and name in self.descriptions:
+                kind, text = self.descriptions[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            seen.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), counts, total, count, buckets in snapshots:
+            header(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for collector in self.collectors:
+            for name, kind, text, samples in collector():
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+registry.describe("http_requests_total", "counter", "HTTP requests by method, route and status code")
+registry.describe("http_request_duration_seconds", "histogram", "HTTP request latency by method and route")
+registry.describe("db_calls_total", "counter", "DatabaseManager calls by table and operation")
+registry.describe("db_errors_total", "counter", "DatabaseManager calls that raised, by table and operation")
+registry.describe("db_call_duration_seconds", "histogram", "DatabaseManager call latency by table and operation")
+
+
+# ----- Database call hooks -----
+def record_db_call(table, operation, started, error=None):
+    elapsed = time.perf_counter() - started
+    labels = {"table": table, "operation": operation}
+    registry.inc("db_calls_total", labels)
+    registry.observe("db_call_duration_seconds", labels, elapsed)
+    if error is not None:
+        registry.inc("db_errors_total", labels)
+    if elapsed * 1000 >= SLOW_CALL_MS:
+        logger.warning("Slow database call %s.%s took %.1f ms%s", table, operation, elapsed * 1000,
+                       f" (failed: {error})" if error is not None else "")
+
+
+def instrumented(table, operation):
+    """Time a DatabaseManager method; table=None takes the table name from the first argument"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            name = table or kwargs.get("table") or args[0]
+            started = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception as e:
+                record_db_call(name, operation, started, e)
+                raise
+            if inspect.isawaitable(result):
+                return observe_awaitable(result, name, operation, started)
+            record_db_call(name, operation, started)
+            return result
+        return wrapper
+    return decorator
+
+
+async def observe_awaitable(awaitable, table, operation, started):
+    try:
+        result = await awaitable
+    except Exception as e:
+        record_db_call(table, operation, started, e)
+        raise
+    record_db_call(table, operation, started)
+    return result
+
+
+# ----- HTTP middleware -----
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency per route template"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # Live event streams stay open by design, so they are not reported as slow
+                status["streaming"] = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message["headers"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            registry.inc("http_requests_total", {"method": scope["method"], "route": path, "status": str(status["code"])})
+            registry.observe("http_request_duration_seconds", {"method": scope["method"], "route": path}, elapsed)
+            if elapsed * 1000 >= SLOW_REQUEST_MS and not status["streaming"]:
+                logger.warning("Slow request %s %s took %.1f ms", scope["method"], scope["path"], elapsed * 1000)
+
+
+# ----- Startup report -----
+class StartupReport:
+    """Seconds spent in each startup phase (imports, client init, ...), logged when the app is ready"""
+    def __init__(self):
+        self.phases = {}
+
+    def record(self, phase, seconds):
+        self.phases[phase] = seconds
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def log(self):
+        breakdown = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+        startup_logger.info("Startup took %.1f ms: %s", sum(self.phases.values()) * 1000, breakdown)
+
+    def collect(self):
+        yield ("startup_phase_seconds", "gauge", "Seconds spent in each startup phase of this worker",
+               [({"phase": name}, round(seconds, 6)) for name, seconds in self.phases.items()])
+
+
+startup = StartupReport()
+registry.register_collector(startup.collect)
@@ -0,0 +1,571 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+'''Local SQLite backend that mimics the parts of the Supabase query builder used by DatabaseManager'''
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    phone TEXT NOT NULL,
+    address TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS couriers (
+    courier_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT UNIQUE NOT NULL,
+    vehicle_no TEXT
+);
+
+CREATE TABLE IF NOT EXISTS parcels (
+    parcel_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender_id INTEGER REFERENCES customers(customer_id) ON DELETE CASCADE,
+    receiver_id INTEGER REFERENCES customers(customer_id) ON DELETE CASCADE,
+    weight REAL NOT NULL,
+    price REAL NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('Pending', 'In Transit', 'Delivered', 'Cancelled')),
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS tracking (
+    tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parcel_id INTEGER REFERENCES parcels(parcel_id) ON DELETE CASCADE,
+    courier_id INTEGER REFERENCES couriers(courier_id) ON DELETE SET NULL,
+    location TEXT NOT NULL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    remarks TEXT
+);
+
+CREATE TABLE IF NOT EXISTS parcel_status (
+    parcel_id INTEGER PRIMARY KEY REFERENCES parcels(parcel_id) ON DELETE CASCADE,
+    status TEXT,
+    tracking_id INTEGER,
+    courier_id INTEGER,
+    location TEXT,
+    remarks TEXT,
+    timestamp TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    parcel_id INTEGER PRIMARY KEY REFERENCES parcels(parcel_id) ON DELETE CASCADE,
+    courier_id INTEGER NOT NULL REFERENCES couriers(courier_id) ON DELETE CASCADE,
+    assigned_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcels_sender_id ON parcels(sender_id);
+CREATE INDEX IF NOT EXISTS idx_parcels_receiver_id ON parcels(receiver_id);
+CREATE INDEX IF NOT EXISTS idx_parcels_status ON parcels(status);
+CREATE INDEX IF NOT EXISTS idx_parcels_created_at ON parcels(created_at);
+CREATE INDEX IF NOT EXISTS idx_parcels_weight ON parcels(weight);
+CREATE INDEX IF NOT EXISTS idx_parcels_price ON parcels(price);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name);
+CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
+CREATE INDEX IF NOT EXISTS idx_couriers_name ON couriers(name);
+CREATE INDEX IF NOT EXISTS idx_couriers_vehicle_no ON couriers(vehicle_no);
+CREATE INDEX IF NOT EXISTS idx_tracking_parcel_id ON tracking(parcel_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_tracking_courier_id ON tracking(courier_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_courier_id ON assignments(courier_id, parcel_id);
+"""
+
+# Full-text (trigram) indexes backing search_customers / search_couriers: table -> (key, searched columns)
+SEARCH_TABLES = {
+    "customers": ("customer_id", ("name", "email", "phone")),
+    "couriers": ("courier_id", ("name", "phone", "vehicle_no")),
+}
+
+def search_schema(table, key, columns):
+    """FTS5 trigram index over `columns`, kept in sync with `table` by triggers"""
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_search USING fts5({cols}, content='{table}', content_rowid='{key}', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {table}_search (rowid, {cols}) VALUES (new.{key}, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {table}_search ({table}_search, rowid, {cols}) VALUES ('delete', old.{key}, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE ON {table} BEGIN
+    INSERT INTO {table}_search ({table}_search, rowid, {cols}) VALUES ('delete', old.{key}, {old});
+    INSERT INTO {table}_search (rowid, {cols}) VALUES (new.{key}, {new});
+END;
+"""
+
+# Latest status and tracking event per parcel (GET /parcels/{parcel_id}/status), kept current by triggers
+NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+LATEST_TRACKING = """UPDATE parcel_status SET (tracking_id, courier_id, location, remarks, timestamp) = (
+        SELECT tracking_id, courier_id, location, remarks, timestamp FROM tracking WHERE parcel_id = {row}.parcel_id
+        ORDER BY timestamp DESC, tracking_id DESC LIMIT 1), updated_at = """ + NOW + """ WHERE parcel_id = {row}.parcel_id;"""
+
+PARCEL_STATUS_SCHEMA = f"""
+CREATE TRIGGER IF NOT EXISTS parcel_status_parcel_insert AFTER INSERT ON parcels BEGIN
+    INSERT INTO parcel_status (parcel_id, status, updated_at) VALUES (new.parcel_id, new.status, {NOW})
+    ON CONFLICT (parcel_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at;
+END;
+CREATE TRIGGER IF NOT EXISTS parcel_status_parcel_update AFTER UPDATE OF status ON parcels BEGIN
+    UPDATE parcel_status SET status = new.status, updated_at = {NOW} WHERE parcel_id = new.parcel_id;
+END;
+CREATE TRIGGER IF NOT EXISTS parcel_status_tracking_insert AFTER INSERT ON tracking BEGIN
+    UPDATE parcel_status SET tracking_id = new.tracking_id, courier_id = new.courier_id, location = new.location,
+        remarks = new.remarks, timestamp = new.timestamp, updated_at = {NOW}
+    WHERE parcel_id = new.parcel_id AND (tracking_id IS NULL
+        OR (COALESCE(timestamp, ''), tracking_id) < (COALESCE(new.timestamp, ''), new.tracking_id));
+END;
+CREATE TRIGGER IF NOT EXISTS parcel_status_tracking_update AFTER UPDATE OF parcel_id, courier_id, location, remarks, timestamp ON tracking BEGIN
+    {LATEST_TRACKING.format(row="old")}
+    {LATEST_TRACKING.format(row="new")}
+END;
+CREATE TRIGGER IF NOT EXISTS parcel_status_tracking_delete AFTER DELETE ON tracking BEGIN
+    {LATEST_TRACKING.format(row="old")}
+END;
+"""
+
+# Only pending parcels keep a courier assignment: a scan, status update or cancellation releases it
+ASSIGNMENT_SCHEMA = """
+CREATE TRIGGER IF NOT EXISTS assignments_parcel_status AFTER UPDATE OF status ON parcels
+WHEN new.status <> 'Pending' BEGIN
+    DELETE FROM assignments WHERE parcel_id = new.parcel_id;
+END;
+"""
+
+# Scan counts per hour and day, per courier and per location (GET /tracking/rollups), kept current by triggers
+ROLLUP_PERIODS = {"hour": "%Y-%m-%dT%H:00:00", "day": "%Y-%m-%dT00:00:00"}
+ROLLUP_DIMENSIONS = {"courier": "CAST({row}.courier_id AS TEXT)", "location": "{row}.location"}
+
+def rollup_upsert(row, sign):
+    """Add `sign` to every rollup bucket the tracking row `row` (new/old) counts towards"""
+    selects = " UNION ALL ".join(
+        f"SELECT '{period}' AS period, '{dimension}' AS dimension, strftime('{fmt}', {row}.timestamp) AS bucket, "
+        f"{expr.format(row=row)} AS dimension_key, {sign} AS scans"
+        for period, fmt in ROLLUP_PERIODS.items() for dimension, expr in ROLLUP_DIMENSIONS.items())
+    return f"""INSERT INTO tracking_rollups (period, dimension, bucket, dimension_key, scans)
+        SELECT * FROM ({selects}) WHERE bucket IS NOT NULL AND dimension_key IS NOT NULL
+        ON CONFLICT (period, dimension, bucket, dimension_key) DO UPDATE SET scans = scans + excluded.scans;"""
+
+def rollup_schema():
+    return f"""
+CREATE TABLE IF NOT EXISTS tracking_rollups (
+    period TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    dimension_key TEXT NOT NULL,
+    scans INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, dimension, bucket, dimension_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tracking_rollups_key ON tracking_rollups(period, dimension, dimension_key, bucket);
+CREATE TRIGGER IF NOT EXISTS tracking_rollups_insert AFTER INSERT ON tracking BEGIN
+    {rollup_upsert("new", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS tracking_rollups_delete AFTER DELETE ON tracking BEGIN
+    {rollup_upsert("old", -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS tracking_rollups_update AFTER UPDATE OF courier_id, location, timestamp ON tracking BEGIN
+    {rollup_upsert("old", -1)}
+    {rollup_upsert("new", 1)}
+END;
+"""
+
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+# Status changes allowed by a scan; Delivered and Cancelled parcels accept no further scans
+SCAN_TRANSITIONS = {
+    "Pending": ("Pending", "In Transit", "Cancelled"),
+    "In Transit": ("In Transit", "Delivered", "Cancelled"),
+}
+
+
+# PostgREST resource embedding in select(): alias:table!constraint(columns)
+EMBED = re.compile(r"^(?:(\w+):)?(\w+)(?:!(\w+))?\((.*)\)$")
+
+def split_columns(text):
+    """Split a select() column list on commas that are not inside an embed's parentheses"""
+    names, depth, current = [], 0, ""
+    for char in text:
+        depth += (char == "(") - (char == ")")
+        if char == "," and depth == 0:
+            names.append(current.strip())
+            current = ""
+        else:
+            current += char
+    names.append(current.strip())
+    return [name for name in names if name]
+
+
+class SQLiteResponse:
+    """Result of an executed query, shaped like the Supabase APIResponse"""
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteQuery:
+    """Chainable query builder for a single table"""
+    def __init__(self, client, table):
+        if table not in client.columns:
+            raise ValueError(f"Unknown table: {table}")
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = ["*"]
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.params = []
+        self.orders = []
+        self.row_limit = None
+        self.count = None
+        self.head = False
+        self.embeds = []
+
+    # ----- Actions -----
+    def select(self, *columns, count=None, head=None):
+        self.action = "select"
+        self.count = count
+        self.head = bool(head)
+        names = split_columns(",".join(columns or ("*",)))
+        self.embeds = [self._embed(EMBED.match(n)) for n in names if EMBED.match(n)]
+        names = [n for n in names if not EMBED.match(n)]
+        self.columns = names if names != ["*"] else ["*"]
+        return self
+
+    def insert(self, json):
+        self.action = "insert"
+        self.payload = json if isinstance(json, list) else [json]
+        return self
+
+    def upsert(self, json, on_conflict=""):
+        """Insert, or update only the given columns of rows whose conflict key already exists"""
+        self.action = "upsert"
+        self.payload = json if isinstance(json, list) else [json]
+        self.on_conflict = on_conflict or self.client.primary_keys[self.table]
+        return self
+
+    def update(self, json):
+        self.action = "update"
+        self.payload = json
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # ----- Filters -----
+    def _filter(self, column, op, value):
+        self.filters.append(f"{self._column(column)} {op} ?")
+        self.params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, OPERATORS["eq"], value)
+
+    def neq(self, column, value):
+        return self._filter(column, OPERATORS["neq"], value)
+
+    def gt(self, column, value):
+        return self._filter(column, OPERATORS["gt"], value)
+
+    def gte(self, column, value):
+        return self._filter(column, OPERATORS["gte"], value)
+
+    def lt(self, column, value):
+        return self._filter(column, OPERATORS["lt"], value)
+
+    def lte(self, column, value):
+        return self._filter(column, OPERATORS["lte"], value)
+
+    def ilike(self, column, pattern):
+        # SQLite LIKE is already case-insensitive for ASCII; backslash escapes a wildcard, as in Postgres
+        self.filters.append(f"{self._column(column)} LIKE ? ESCAPE '\\'")
+        self.params.append(pattern)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.filters.append("0")
+            return self
+        self.filters.append(f"{self._column(column)} IN ({', '.join('?' for _ in values)})")
+        self.params.extend(values)
+        return self
+
+    # ----- Modifiers -----
+    def order(self, column, desc=False):
+        self.orders.append(f"{self._column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size):
+        self.row_limit = int(size)
+        return self
+
+    # ----- Execution -----
+    def _column(self, name):
+        if name not in self.client.columns[self.table]:
+            raise ValueError(f"Unknown column: {self.table}.{name}")
+        return name
+
+    def _embed(self, match):
+        """(alias, SQL expression) for an embedded row of a referenced table, built with json_object"""
+        alias, table, constraint, inner = match.groups()
+        links = [fk for fk in self.client.foreign_keys[self.table] if fk[1] == table]
+        if constraint:
+            links = [fk for fk in links if constraint == f"{self.table}_{fk[0]}_fkey"]
+        if len(links) != 1:
+            raise ValueError(f"Cannot embed {table} in {self.table}: specify exactly one foreign key")
+        column, _, ref_column = links[0]
+        cols = self.client.columns[table] if inner.strip() in ("", "*") else [c.strip() for c in inner.split(",")]
+        for c in cols:
+            if c not in self.client.columns[table]:
+                raise ValueError(f"Unknown column: {table}.{c}")
+        pairs = ", ".join(f"'{c}', e.{c}" for c in cols)
+        sql = f"(SELECT json_object({pairs}) FROM {table} AS e WHERE e.{ref_column} = {self.table}.{column})"
+        return alias or table, sql
+
+    def _where(self):
+        return f" WHERE {' AND '.join(self.filters)}" if self.filters else ""
+
+    def _build(self):
+        """Build the SQL text and parameters; identical shapes give identical SQL so statements are reused"""
+        if self.action == "select":
+            cols = f"{self.table}.*" if self.columns == ["*"] else ", ".join(self._column(c) for c in self.columns)
+            cols += "".join(f", {sql} AS {alias}" for alias, sql in self.embeds)
+            sql = f"SELECT {cols} FROM {self.table}{self._where()}"
+            if self.orders:
+                sql += f" ORDER BY {', '.join(self.orders)}"
+            if self.row_limit is not None:
+                sql += f" LIMIT {self.row_limit}"
+            return sql, self.params
+        if self.action in ("insert", "upsert"):
+            keys = []
+            for row in self.payload:
+                keys.extend(k for k in row if k not in keys)
+            placeholders = "(" + ", ".join("?" for _ in keys) + ")"
+            sql = (f"INSERT INTO {self.table} ({', '.join(self._column(k) for k in keys)}) "
+                   f"VALUES {', '.join(placeholders for _ in self.payload)}")
+            if self.action == "upsert":
+                conflict = [self._column(c.strip()) for c in self.on_conflict.split(",")]
+                sets = ", ".join(f"{k} = excluded.{k}" for k in keys if k not in conflict)
+                sql += f" ON CONFLICT ({', '.join(conflict)}) " + (f"DO UPDATE SET {sets}" if sets else "DO NOTHING")
+            return sql + " RETURNING *", [row.get(k) for row in self.payload for k in keys]
+        if self.action == "update":
+            sets = ", ".join(f"{self._column(k)} = ?" for k in self.payload)
+            sql = f"UPDATE {self.table} SET {sets}{self._where()} RETURNING *"
+            return sql, list(self.payload.values()) + self.params
+        sql = f"DELETE FROM {self.table}{self._where()} RETURNING *"
+        return sql, self.params
+
+    def execute(self):
+        if self.action == "update" and not self.payload:
+            return SQLiteResponse([])
+        count = None
+        if self.action == "select" and self.count:
+            sql = f"SELECT COUNT(*) AS count FROM {self.table}{self._where()}"
+            count = self.client.execute(sql, self.params)[0]["count"]
+            if self.head:
+                return SQLiteResponse([], count)
+        sql, params = self._build()
+        rows = self.client.execute(sql, params)
+        for alias, _ in self.embeds:
+            for row in rows:
+                row[alias] = json.loads(row[alias]) if row[alias] is not None else None
+        return SQLiteResponse(rows, count)
+
+
+# ----- Stored procedures (SQLite versions of the SQL functions in the README) -----
+def scan_parcel(conn, p_parcel_id, p_courier_id, p_location, p_remarks="", p_status=None, p_timestamp=None):
+    """Insert a tracking event and apply the status transition (the parcel_status triggers refresh the summary)"""
+    row = conn.execute("SELECT status FROM parcels WHERE parcel_id = ?", (p_parcel_id,)).fetchone()
+    if row is None:
+        return {"success": False, "error": "not_found", "message": f"Parcel {p_parcel_id} not found"}
+    current, new = row["status"], p_status or row["status"]
+    if new not in SCAN_TRANSITIONS.get(current, ()):
+        return {"success": False, "error": "invalid_transition", "message": f"Invalid status transition {current} -> {new}"}
+    event = dict(conn.execute(
+        "INSERT INTO tracking (parcel_id, courier_id, location, timestamp, remarks) VALUES (?, ?, ?, ?, ?) RETURNING *",
+        (p_parcel_id, p_courier_id, p_location, p_timestamp or datetime.now().isoformat(), p_remarks or "")).fetchone())
+    if new != current:
+        conn.execute("UPDATE parcels SET status = ? WHERE parcel_id = ?", (new, p_parcel_id))
+    return {"success": True, "tracking": event, "status": new, "previous_status": current}
+
+def search_rows(conn, table, q, max_rows=20):
+    """Rows of `table` containing `q` in a searched column: exact matches, then prefixes, then word prefixes, then the rest"""
+    key, columns = SEARCH_TABLES[table]
+    q = q.strip()
+    pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    like = " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns)
+    if len(q) >= 3:
+        # Trigram index lookup; shorter queries have no trigram and scan the table instead
+        where = f"{key} IN (SELECT rowid FROM {table}_search WHERE {table}_search MATCH ?)"
+        params = ['"' + q.replace('"', '""') + '"']
+    else:
+        where = like
+        params = [f"%{pattern}%"] * len(columns)
+    exact = " OR ".join(f"lower({c}) = lower(?)" for c in columns)
+    rank = f"CASE WHEN {exact} THEN 0 WHEN {like} THEN 1 WHEN {like} THEN 2 ELSE 3 END"
+    params += [q] * len(columns) + [f"{pattern}%"] * len(columns) + [f"% {pattern}%"] * len(columns) + [int(max_rows)]
+    rows = conn.execute(f"SELECT * FROM {table} WHERE {where} ORDER BY {rank}, {key} LIMIT ?", params).fetchall()
+    return [dict(row) for row in rows]
+
+def tracking_for_parcels(conn, p_parcel_ids, p_limit, p_after=0, p_page_size=1000):
+    """The newest p_limit events of each parcel, one page of p_page_size rows after tracking_id p_after"""
+    rows = conn.execute(
+        "SELECT tracking_id, parcel_id, courier_id, location, timestamp, remarks FROM ("
+        "SELECT *, row_number() OVER (PARTITION BY parcel_id ORDER BY timestamp DESC, tracking_id DESC) AS rank "
+        "FROM tracking WHERE parcel_id IN (SELECT value FROM json_each(?))) "
+        "WHERE rank <= ? AND tracking_id > ? ORDER BY tracking_id LIMIT ?",
+        (json.dumps(p_parcel_ids), int(p_limit), int(p_after), int(p_page_size))).fetchall()
+    return [dict(row) for row in rows]
+
+def backfill_tracking_rollups(conn, p_from=None, p_to=None):
+    """Recompute the rollups of the whole days from p_from to p_to (every day when omitted) from the tracking table"""
+    params = [p_from, p_from, p_to, p_to]
+    day = ROLLUP_PERIODS["day"]
+    in_days = "(? IS NULL OR {0} >= strftime('%s', ?)) AND (? IS NULL OR {0} < strftime('%s', ?, '+1 day'))" % (day, day)
+    conn.execute(f"DELETE FROM tracking_rollups WHERE {in_days.format('bucket')}", params)
+    buckets = 0
+    for period, fmt in ROLLUP_PERIODS.items():
+        for dimension, expr in ROLLUP_DIMENSIONS.items():
+            bucket, key = f"strftime('{fmt}', timestamp)", expr.format(row="tracking")
+            buckets += conn.execute(
+                f"INSERT INTO tracking_rollups (period, dimension, bucket, dimension_key, scans) "
+                f"SELECT '{period}', '{dimension}', {bucket}, {key}, COUNT(*) FROM tracking "
+                f"WHERE {bucket} IS NOT NULL AND {key} IS NOT NULL AND {in_days.format(f'strftime({day!r}, timestamp)')} "
+                f"GROUP BY {bucket}, {key}", params).rowcount
+    return {"success": True, "buckets": buckets}
+
+def release_stale_assignments(conn):
+    """Delete the assignments of parcels that are no longer Pending (left by a run that overlapped a status change)"""
+    released = conn.execute(
+        "DELETE FROM assignments WHERE parcel_id IN "
+        "(SELECT a.parcel_id FROM assignments a JOIN parcels p ON p.parcel_id = a.parcel_id WHERE p.status <> 'Pending')").rowcount
+    return {"success": True, "released": released}
+
+def backfill_parcel_status(conn):
+    """Rebuild every parcel_status row from parcels and their latest tracking event"""
+    rows = conn.execute(
+        "INSERT INTO parcel_status (parcel_id, status, tracking_id, courier_id, location, remarks, timestamp, updated_at) "
+        f"SELECT p.parcel_id, p.status, t.tracking_id, t.courier_id, t.location, t.remarks, t.timestamp, {NOW} "
+        "FROM parcels p LEFT JOIN tracking t ON t.tracking_id = (SELECT tracking_id FROM tracking WHERE parcel_id = p.parcel_id "
+        "ORDER BY timestamp DESC, tracking_id DESC LIMIT 1) WHERE true "
+        "ON CONFLICT (parcel_id) DO UPDATE SET status = excluded.status, tracking_id = excluded.tracking_id, "
+        "courier_id = excluded.courier_id, location = excluded.location, remarks = excluded.remarks, "
+        "timestamp = excluded.timestamp, updated_at = excluded.updated_at").rowcount
+    return {"success": True, "parcels": rows}
+
+PROCEDURES = {
+    "scan_parcel": scan_parcel,
+    "search_customers": lambda conn, **params: search_rows(conn, "customers", **params),
+    "search_couriers": lambda conn, **params: search_rows(conn, "couriers", **params),
+    "backfill_tracking_rollups": backfill_tracking_rollups,
+    "tracking_for_parcels": tracking_for_parcels,
+    "release_stale_assignments": release_stale_assignments,
+}
+
+
+class SQLiteRPC:
+    """Stored procedure call, shaped like the Supabase rpc() builder; runs as one transaction"""
+    def __init__(self, client, fn, params):
+        self.client = client
+        self.fn = fn
+        self.params = params
+
+    def execute(self):
+        if self.fn not in PROCEDURES:
+            raise ValueError(f"Unknown function: {self.fn}")
+        return SQLiteResponse(self.client.transaction(PROCEDURES[self.fn], **self.params))
+
+
+class SQLiteClient:
+    """Embedded storage engine: one WAL-mode connection shared by all threads of the process"""
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        for table, (key, columns) in SEARCH_TABLES.items():
+            exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table}_search",)).fetchone()
+            self.conn.executescript(search_schema(table, key, columns))
+            if not exists:
+                # Index rows that were written before the search table existed
+                self.conn.execute(f"INSERT INTO {table}_search ({table}_search) VALUES ('rebuild')")
+        status_triggers = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'parcel_status_tracking_insert'").fetchone()
+        self.conn.executescript(PARCEL_STATUS_SCHEMA)
+        if not status_triggers:
+            # Fill parcel_status for parcels and scans written before the triggers existed
+            self.transaction(backfill_parcel_status)
+        assignment_trigger = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'assignments_parcel_status'").fetchone()
+        self.conn.executescript(ASSIGNMENT_SCHEMA)
+        if not assignment_trigger:
+            # Release assignments of parcels that left Pending before the trigger existed
+            self.conn.execute("DELETE FROM assignments WHERE parcel_id IN (SELECT parcel_id FROM parcels WHERE status <> 'Pending')")
+        rollups_exist = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tracking_rollups'").fetchone()
+        self.conn.executescript(rollup_schema())
+        if not rollups_exist:
+            # Count the tracking events that were written before the rollups existed
+            self.transaction(backfill_tracking_rollups)
+        self.columns, self.primary_keys, self.foreign_keys = {}, {}, {}
+        for (table,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall():
+            info = self.conn.execute(f"PRAGMA table_info({table})").fetchall()
+            self.columns[table] = [row["name"] for row in info]
+            self.primary_keys[table] = ",".join(row["name"] for row in info if row["pk"])
+            self.foreign_keys[table] = [(row["from"], row["table"], row["to"])
+                                        for row in self.conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()]
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def rpc(self, fn, params=None):
+        return SQLiteRPC(self, fn, params or {})
+
+    def transaction(self, func, **params):
+        """Run func(conn, **params) inside BEGIN IMMEDIATE ... COMMIT, rolling back on error"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self.conn, **params)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def close(self):
+        self.conn.close()
+
+
+class AsyncSQLiteQuery(SQLiteQuery):
+    """Query builder whose execute() runs on a worker thread"""
+    async def execute(self):
+        return await asyncio.to_thread(super().execute)
+
+
+class AsyncSQLiteRPC(SQLiteRPC):
+    async def execute(self):
+        return await asyncio.to_thread(super().execute)
+
+
+class AsyncSQLiteClient:
+    """Async facade over a SQLiteClient, sharing its connection"""
+    def __init__(self, client):
+        self.sync_client = client
+
+    def table(self, name):
+        return AsyncSQLiteQuery(self.sync_client, name)
+
+    def rpc(self, fn, params=None):
+        return AsyncSQLiteRPC(self.sync_client, fn, params or {})
@@ -0,0 +1,251 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from src.db import ROOT_DIR, InsertInterrupted
+
+'''Write-behind buffer for tracking scans: accept now, insert in batches later'''
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, so every worker would share one spill file (run a single worker)
+    fcntl = None
+
+
+def lock_file(f, wait=True):
+    """Take an exclusive lock on an open file, held until it is closed; False when another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        return True
+    except BlockingIOError:
+        return False
+
+def is_linked(f, path):
+    """True when `path` still names the open file (not removed or replaced by another process)"""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+def worker_spill_path(base, worker):
+    """Spill file of one worker process: tracking_spill.ndjson -> tracking_spill.<worker>.ndjson"""
+    if fcntl is None:
+        return base
+    root, ext = os.path.splitext(base)
+    return f"{root}.{worker}{ext}"
+
+def read_events(f):
+    f.seek(0)
+    return [json.loads(line) for line in f if line.strip()]
+
+
+class BufferFull(Exception):
+    pass
+
+
+class TrackingBuffer:
+    """Bounded in-memory queue of tracking events, flushed by size or interval and mirrored to a spill file.
+
+    Spill writes run on a worker thread and are grouped: every event submitted while a write is in progress
+    goes into the next single write (and fsync). An event is queued, and acknowledged, once it is on disk.
+    Each worker process writes its own spill file and holds a lock on it; files no running worker holds are
+    taken over, once, by the next buffer that starts.
+    """
+    def __init__(self, flush, max_size=10000, batch_size=500, interval=0.5, spill_path=None, fsync=False, worker=None):
+        self.flush = flush  # async callable taking a list of events, returning one result per event
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.spill_base = spill_path
+        self.spill_path = worker_spill_path(spill_path, worker or os.getpid()) if spill_path else None
+        self.fsync = fsync
+        self.pending = deque()
+        self.spill = None
+        self.spill_lock = asyncio.Lock()  # one file operation (append or rewrite) at a time
+        self.unwritten = []  # events waiting for the next spill write
+        self.writing = 0  # events in the spill write in progress
+        self.spill_write = None  # future of the next spill write, shared by its submitters
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.flushed = 0
+        self.dropped = 0
+
+    async def start(self):
+        """Replay events left in spill files by stopped or crashed workers, then start the flush loop"""
+        if self.spill_path:
+            self._open_spill()
+            if self.pending:
+                logger.warning("Replaying %d buffered tracking events into %s", len(self.pending), self.spill_path)
+        self.task = asyncio.create_task(self._run())
+
+    def _open_spill(self):
+        while True:
+            self.spill = open(self.spill_path, "a+")
+            lock_file(self.spill)
+            if is_linked(self.spill, self.spill_path):
+                break
+            # Taken over and removed by another worker while we waited for the lock: start a new file
+            self.spill.close()
+        self.pending.extend(read_events(self.spill))
+        if fcntl is None:
+            return
+        claimed = []
+        for path in sorted(glob.glob(worker_spill_path(self.spill_base, "*"))) + [self.spill_base]:
+            if path == self.spill_path or not os.path.exists(path):
+                continue
+            try:
+                f = open(path)
+            except FileNotFoundError:
+                continue
+            if not lock_file(f, wait=False) or not is_linked(f, path):
+                f.close()  # held by a running worker, or already taken over
+                continue
+            claimed.append((path, f))
+        events = [event for _, f in claimed for event in read_events(f)]
+        if events:
+            # On disk in our own file before the orphaned files go, so a crash here loses nothing
+            self._append_spill(events)
+            self.pending.extend(events)
+        for path, f in claimed:
+            os.remove(path)
+            f.close()
+
+    async def stop(self):
+        """Stop the flush loop and write out everything still queued"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.spill_write:
+            await asyncio.gather(self.spill_write, return_exceptions=True)
+        await self.flush_pending()
+        if self.spill:
+            if not self.pending:
+                os.remove(self.spill_path)  # nothing left to replay; per-worker files would otherwise pile up
+            self.spill.close()
+
+    async def submit(self, event):
+        """Queue one event once it is in the spill file; raises BufferFull when the queue is at capacity (backpressure)"""
+        if len(self.pending) + len(self.unwritten) + self.writing >= self.max_size:
+            raise BufferFull(f"Tracking buffer full ({self.max_size} events)")
+        event = {**event, "timestamp": event.get("timestamp") or datetime.now().isoformat()}
+        if not self.spill:
+            self._enqueue([event])
+            return
+        self.unwritten.append(event)
+        if self.spill_write is None:
+            self.spill_write = asyncio.ensure_future(self._write_spill())
+        # Shielded: a cancelled request must not cancel the write other submitters wait for
+        await asyncio.shield(self.spill_write)
+
+    async def _write_spill(self):
+        async with self.spill_lock:
+            events, self.unwritten, self.spill_write = self.unwritten, [], None
+            self.writing = len(events)
+            try:
+                await asyncio.to_thread(self._append_spill, events)
+            finally:
+                self.writing = 0
+            # Queued under the lock, so a spill rewrite never misses an event that is already on disk
+            self._enqueue(events)
+
+    def _append_spill(self, events):
+        self.spill.write("".join(json.dumps(event) + "\n" for event in events))
+        self.spill.flush()
+        if self.fsync:
+            os.fsync(self.spill.fileno())
+
+    def _enqueue(self, events):
+        self.pending.extend(events)
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush_pending()
+
+    async def flush_pending(self):
+        while self.pending:
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                results = await self.flush(batch)
+            except asyncio.CancelledError:
+                self.pending.extendleft(reversed(batch))
+                raise
+            except InsertInterrupted as e:
+                # Database unavailable part-way: the events it stored are done, the rest stay at the front for the next tick
+                self._record(batch, e.results)
+                self.pending.extendleft(reversed(batch[len(e.results):]))
+                logger.warning("Tracking flush interrupted, %d events kept: %s", len(self.pending), e)
+                if e.results:
+                    await self._rewrite_spill()
+                return
+            except Exception as e:
+                self.pending.extendleft(reversed(batch))
+                logger.warning("Tracking flush failed, %d events kept: %s", len(self.pending), e)
+                return
+            self._record(batch, results)
+            await self._rewrite_spill()
+
+    def _record(self, batch, results):
+        """Count stored events and log the ones the database rejected (they would fail again on retry)"""
+        for event, result in zip(batch, results):
+            if result["success"]:
+                self.flushed += 1
+            else:
+                self.dropped += 1
+                logger.error("Dropping tracking event %s: %s", event, result["message"])
+
+    async def _rewrite_spill(self):
+        """Shrink the spill file to the events that are still queued"""
+        if not self.spill:
+            return
+        async with self.spill_lock:
+            await asyncio.to_thread(self._replace_spill, list(self.pending))
+
+    def _replace_spill(self, events):
+        tmp_path = self.spill_path + ".tmp"
+        tmp = open(tmp_path, "w")
+        # Locked before it takes the spill file's name, so no other worker can take it over
+        lock_file(tmp)
+        tmp.writelines(json.dumps(event) + "\n" for event in events)
+        tmp.flush()
+        if self.fsync:
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.spill_path)
+        self.spill.close()
+        self.spill = tmp
+
+    def stats(self):
+        return {"pending": len(self.pending), "max_size": self.max_size, "flushed": self.flushed, "dropped": self.dropped}
+
+
+def buffer_from_env(flush):
+    """TrackingBuffer configured from .env, or None when TRACKING_WRITE_BEHIND is off"""
+    if os.getenv("TRACKING_WRITE_BEHIND", "0").lower() not in ("1", "true", "yes"):
+        return None
+    spill_path = os.getenv("TRACKING_SPILL_PATH", "tracking_spill.ndjson")
+    if spill_path and not os.path.isabs(spill_path):
+        spill_path = os.path.join(ROOT_DIR, spill_path)
+    return TrackingBuffer(
+        flush,
+        max_size=int(os.getenv("TRACKING_BUFFER_SIZE", "10000")),
+        batch_size=int(os.getenv("TRACKING_BATCH_SIZE", "500")),
+        interval=float(os.getenv("TRACKING_FLUSH_INTERVAL", "0.5")),
+        spill_path=spill_path or None,
+        fsync=os.getenv("TRACKING_SPILL_FSYNC", "0").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,49 @@
+import os
+import sys
+
+# Tests run against the embedded SQLite backend, one in-memory database per test
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = ":memory:"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.cache import customer_cache, courier_cache, tracking_cache
+from src.db import DatabaseManager
+from src.sqlite_client import SQLiteClient
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """The read caches are process-wide; start every test empty"""
+    for cache in (customer_cache, courier_cache, tracking_cache):
+        cache.clear()
+
+
+@pytest.fixture
+def client():
+    client = SQLiteClient(":memory:")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def db(client):
+    return DatabaseManager(client)
+
+
+@pytest.fixture
+def seeded(db):
+    """Two customers, two couriers and three pending parcels"""
+    db.insert_many("customers", [
+        {"name": "Alice", "email": "alice@example.com", "phone": "111", "address": "1 Main St"},
+        {"name": "Bob", "email": "bob@example.com", "phone": "222", "address": "2 Main St"},
+    ])
+    db.insert_many("couriers", [
+        {"name": "Carl", "phone": "333", "vehicle_no": "KA-01"},
+        {"name": "Dana", "phone": "444", "vehicle_no": "KA-02"},
+    ])
+    db.insert_many("parcels", [
+        {"sender_id": 1, "receiver_id": 2, "weight": w, "price": 10.0, "status": "Pending", "created_at": f"2025-01-0{i}T10:00:00"}
+        for i, w in enumerate([1.0, 2.0, 3.0], start=1)
+    ])
+    return db
@@ -0,0 +1,19 @@
+import asyncio
+
+from src.analytics import ParcelAnalytics, AsyncParcelAnalytics, frame_cache
+from src.db import AsyncDatabaseManager
+from src.sqlite_client import AsyncSQLiteClient
+
+
+def test_sync_and_async_reports_match_across_pages(client, seeded):
+    frame_cache.clear()
+    seeded.insert_many("tracking", [{"parcel_id": p, "courier_id": 1, "location": "Hub", "timestamp": f"2025-01-0{p}T12:00:00"}
+                                    for p in (1, 2, 3)])
+    sync = ParcelAnalytics(seeded, page_size=2)
+    revenue = sync.report("revenue")
+    assert revenue["success"] and sync.report("weight") == sync.report("weight")
+    frame_cache.clear()
+    analytics = AsyncParcelAnalytics(AsyncDatabaseManager(AsyncSQLiteClient(client)), page_size=2)
+    assert asyncio.run(analytics.report("revenue")) == revenue
+    parcels, tracking = asyncio.run(analytics.load())
+    assert (len(parcels), len(tracking)) == (3, 3)
@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from src.db import get_client
+
+
+@pytest.fixture
+def api():
+    # The lifespan opens a fresh in-memory database and closes it on exit
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def seeded_api(api):
+    api.post("/customers", json={"name": "Alice", "email": "alice@example.com", "phone": "111", "address": "a"})
+    api.post("/couriers", json={"name": "Carl", "phone": "333", "vehicle_no": "KA-01"})
+    api.post("/parcels", json={"sender_id": 1, "receiver_id": 1, "weight": 1.0, "price": 10.0})
+    return api
+
+
+# ----- Tracking rollups -----
+def test_rollups_accept_timezone_aware_bounds(seeded_api):
+    get_client().table("tracking").insert([
+        {"parcel_id": 1, "courier_id": 1, "location": "Hub", "timestamp": f"2025-01-01T{hour}:30:00"} for hour in (20, 21)]).execute()
+    # 02:00 at +05:00 is 21:00 UTC, the timezone the stored timestamps are in
+    response = seeded_api.get("/tracking/rollups", params={"dimension": "location", "start": "2025-01-02T02:00:00+05:00"})
+    assert [r["bucket"] for r in response.json()["data"]] == ["2025-01-01T21:00:00"]
+    response = seeded_api.get("/tracking/rollups", params={"dimension": "location", "end": "2025-01-01T21:00:00Z"})
+    assert [r["bucket"] for r in response.json()["data"]] == ["2025-01-01T20:00:00"]
+
+
+# ----- Parcel filters -----
+def test_parcel_date_filters_accept_timezone_aware_bounds(seeded_api):
+    get_client().table("parcels").update({"created_at": "2025-01-01T21:30:00"}).eq("parcel_id", 1).execute()
+    ids = lambda **params: [p["parcel_id"] for p in seeded_api.get("/parcels", params=params).json()["data"]]
+    assert ids(created_from="2025-01-02T02:00:00+05:00") == [1]
+    assert ids(created_from="2025-01-02T03:00:00+05:00") == []
+    assert ids(created_to="2025-01-01T21:00:00Z") == []
+
+
+# ----- Parcel status -----
+def test_unknown_scan_status_is_rejected(seeded_api):
+    scan = lambda status: seeded_api.post("/parcels/1/scan", json={"courier_id": 1, "location": "Hub", "status": status})
+    assert scan("Lost").status_code == 422
+    assert seeded_api.put("/parcels/1", json={"status": "Lost"}).status_code == 422
+    assert scan("In Transit").status_code == 200
+    assert seeded_api.get("/parcels", params={"status": "Lost"}).status_code == 422
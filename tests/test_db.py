@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+import src.db as dbm
+from src.db import AsyncDatabaseManager, InsertInterrupted, escape_like
+from src.metrics import registry
+from src.sqlite_client import AsyncSQLiteClient
+
+
+def errors(table):
+    return registry.counters.get(("db_errors_total", (("operation", "insert_many"), ("table", table))), 0)
+
+
+def events(parcel_ids, location="Hub"):
+    return [{"parcel_id": p, "courier_id": 1, "location": location, "timestamp": f"2025-01-01T10:00:{i:02d}"}
+            for i, p in enumerate(parcel_ids)]
+
+
+class Unavailable:
+    """Client whose inserts fail with a connection error after `ok` successful calls"""
+    def __init__(self, client, ok):
+        self.client = client
+        self.ok = ok
+
+    def table(self, name):
+        query = self.client.table(name)
+        execute = query.execute
+
+        def flaky():
+            if query.action == "insert":
+                if self.ok <= 0:
+                    raise ConnectionError("database unavailable")
+                self.ok -= 1
+            return execute()
+        query.execute = flaky
+        return query
+
+
+# ----- Filters -----
+def test_like_filter_matches_escaped_text_literally(seeded):
+    seeded.insert_many("customers", [{"name": "Al_ce", "email": "a_l@example.com", "phone": "5", "address": "x"}])
+    filtered = lambda query: [r["name"] for r in seeded.get_customers(filters={"name_like": f"%{escape_like(query)}%"})]
+    assert filtered("l_c") == ["Al_ce"]
+    assert filtered("ali") == ["Alice"]
+
+
+# ----- insert_many -----
+def test_insert_many_isolates_rejected_rows(seeded):
+    before = errors("tracking")
+    results = seeded.insert_many("tracking", events([1, 99, 2, 98]), chunk_size=10)
+    assert [r["success"] for r in results] == [True, False, True, False]
+    assert "FOREIGN KEY" in results[1]["message"]
+    # One rejected chunk plus the two rejected rows
+    assert errors("tracking") - before == 3
+    assert [r["parcel_id"] for r in seeded.get_tracking_page()] == [1, 2]
+
+
+def test_insert_many_raises_when_database_unavailable(client, seeded):
+    db = dbm.DatabaseManager(Unavailable(client, ok=1))
+    with pytest.raises(InsertInterrupted) as error:
+        db.insert_many("tracking", events([1, 2, 3, 1]), chunk_size=2)
+    assert [r["data"]["parcel_id"] for r in error.value.results] == [1, 2]
+    assert len(seeded.get_tracking_page()) == 2
+
+
+def test_async_insert_many_matches_sync(client, seeded):
+    db = AsyncDatabaseManager(AsyncSQLiteClient(client))
+    results = asyncio.run(db.insert_many("tracking", events([1, 99]), chunk_size=10))
+    assert [r["success"] for r in results] == [True, False]
+
+
+# ----- Batch tracking reads -----
+def test_get_tracking_many_reads_every_page(seeded, monkeypatch):
+    monkeypatch.setattr(dbm, "PAGE_SIZE", 3)
+    seeded.insert_many("tracking", events([1, 2, 3] * 4))
+    rows = seeded.get_tracking_many([1, 3])
+    assert [(r["parcel_id"], r["timestamp"][-2:]) for r in rows] == [
+        (1, "00"), (1, "03"), (1, "06"), (1, "09"), (3, "02"), (3, "05"), (3, "08"), (3, "11")]
+    newest = seeded.get_tracking_many([1, 2], limit=2)
+    assert [(r["parcel_id"], r["timestamp"][-2:]) for r in newest] == [(1, "06"), (1, "09"), (2, "07"), (2, "10")]
@@ -0,0 +1,52 @@
+from src.cache import customer_cache, tracking_cache
+from src.db import DatabaseManager
+from src.logic import CustomerManager, ParcelManager, TrackingManager, AssignmentManager
+
+
+class RacingDatabase(DatabaseManager):
+    """Runs `write` once, after a read has fetched its rows but before it returns (a write overlapping the read)"""
+    def __init__(self, client, write):
+        super().__init__(client)
+        self.write = write
+
+    def racing(self, rows):
+        write, self.write = self.write, None
+        if write:
+            write()
+        return rows
+
+    def get_customers(self, *args):
+        return self.racing(super().get_customers(*args))
+
+    def get_tracking(self, parcel_id):
+        return self.racing(super().get_tracking(parcel_id))
+
+    def upsert_assignments(self, *args):
+        # The write lands after the run read the pending parcels, before it saves the plan
+        return super().upsert_assignments(*self.racing(args))
+
+
+# ----- Read-through cache -----
+def test_read_overlapping_a_write_is_not_cached(seeded):
+    writer = CustomerManager(seeded)
+    reader = CustomerManager(RacingDatabase(seeded.client, lambda: writer.add("Zed", "zed@example.com", "555", "z")))
+    assert len(reader.get_all()["data"]) == 2  # read before the write committed
+    assert len(reader.get_all()["data"]) == 3
+    assert len(reader.get_all()["data"]) == 3 and customer_cache.stats()["hits"] == 1
+
+
+def test_tracking_read_overlapping_a_scan_is_not_cached(seeded):
+    scan = lambda: ParcelManager(seeded).scan(1, 1, "Hub", status="In Transit")
+    reader = TrackingManager(RacingDatabase(seeded.client, scan))
+    assert reader.get_by_parcel(1)["data"] == []
+    assert [e["location"] for e in reader.get_by_parcel(1)["data"]] == ["Hub"]
+    assert tracking_cache.get(1)["data"][0]["location"] == "Hub"
+
+
+# ----- Assignment runs -----
+def test_parcel_scanned_during_a_run_is_not_left_assigned(seeded):
+    scan = lambda: ParcelManager(seeded).scan(1, 1, "Hub", status="In Transit")
+    result = AssignmentManager(RacingDatabase(seeded.client, scan)).run()
+    assert (result["success"], result["data"]["assigned"], result["data"]["released"]) == (True, 2, 1)
+    assert [a["parcel_id"] for a in seeded.get_assignments()] == [2, 3]
+    assert AssignmentManager(seeded).run()["data"]["assigned"] == 0
@@ -0,0 +1,161 @@
+import sqlite3
+
+import pytest
+from src.sqlite_client import SQLiteClient
+
+
+# ----- Query builder -----
+def test_select_filters_order_limit(client, seeded):
+    rows = (client.table("parcels").select("parcel_id,weight").gte("weight", 2.0).order("parcel_id", desc=True)
+            .limit(1).execute().data)
+    assert rows == [{"parcel_id": 3, "weight": 3.0}]
+
+
+def test_in_filter_and_empty_in(client, seeded):
+    assert [r["parcel_id"] for r in client.table("parcels").select("*").in_("parcel_id", [1, 3]).order("parcel_id").execute().data] == [1, 3]
+    assert client.table("parcels").select("*").in_("parcel_id", []).execute().data == []
+
+
+def test_ilike_is_case_insensitive(client, seeded):
+    rows = client.table("customers").select("name").ilike("name", "%ALI%").execute().data
+    assert rows == [{"name": "Alice"}]
+
+
+def test_ilike_backslash_escapes_wildcards(client, seeded):
+    client.table("customers").insert({"name": "100% Alice_B", "email": "x@example.com", "phone": "9", "address": "x"}).execute()
+    names = lambda pattern: [r["name"] for r in client.table("customers").select("name").ilike("name", pattern).execute().data]
+    assert sorted(names("%ali%")) == ["100% Alice_B", "Alice"]
+    assert names("%\\%%") == ["100% Alice_B"]
+    assert names("%e\\_%") == ["100% Alice_B"]
+
+
+def test_count_head(client, seeded):
+    response = client.table("parcels").select("*", count="exact", head=True).eq("status", "Pending").execute()
+    assert (response.count, response.data) == (3, [])
+
+
+def test_insert_update_delete_return_rows(client, seeded):
+    inserted = client.table("couriers").insert({"name": "Eve", "phone": "555"}).execute().data
+    assert inserted[0]["courier_id"] == 3 and inserted[0]["vehicle_no"] is None
+    updated = client.table("couriers").update({"vehicle_no": "KA-03"}).eq("courier_id", 3).execute().data
+    assert updated[0]["vehicle_no"] == "KA-03"
+    deleted = client.table("couriers").delete().eq("courier_id", 3).execute().data
+    assert [r["courier_id"] for r in deleted] == [3]
+    assert client.table("couriers").update({}).eq("courier_id", 1).execute().data == []
+
+
+def test_upsert_replaces_only_given_columns(client, seeded):
+    client.table("assignments").upsert([{"parcel_id": 1, "courier_id": 1}]).execute()
+    rows = client.table("assignments").upsert([{"parcel_id": 1, "courier_id": 2}], on_conflict="parcel_id").execute().data
+    assert rows[0]["courier_id"] == 2
+    assert len(client.table("assignments").select("*").execute().data) == 1
+
+
+def test_embed_follows_named_foreign_key(client, seeded):
+    row = (client.table("parcels").select("parcel_id, sender:customers!parcels_sender_id_fkey(name), "
+                                          "receiver:customers!parcels_receiver_id_fkey(*)").eq("parcel_id", 1).execute().data[0])
+    assert row["sender"] == {"name": "Alice"}
+    assert row["receiver"]["email"] == "bob@example.com"
+
+
+def test_unknown_table_and_column_are_rejected(client):
+    with pytest.raises(ValueError):
+        client.table("nope")
+    with pytest.raises(ValueError):
+        client.table("parcels").select("*").eq("nope", 1)
+
+
+def test_constraint_errors_surface_as_integrity_errors(client, seeded):
+    with pytest.raises(sqlite3.IntegrityError):
+        client.table("tracking").insert({"parcel_id": 99, "courier_id": 1, "location": "Hub"}).execute()
+    with pytest.raises(sqlite3.IntegrityError):
+        client.table("parcels").update({"status": "Lost"}).eq("parcel_id", 1).execute()
+
+
+def test_unknown_rpc(client):
+    with pytest.raises(ValueError):
+        client.rpc("nope", {}).execute()
+
+
+# ----- Procedures -----
+def test_scan_parcel_applies_transitions(client, seeded):
+    scan = lambda status: client.rpc("scan_parcel", {"p_parcel_id": 1, "p_courier_id": 1, "p_location": "Hub", "p_status": status}).execute().data
+    assert scan("In Transit")["previous_status"] == "Pending"
+    assert scan("Pending")["error"] == "invalid_transition"
+    assert scan("Delivered")["status"] == "Delivered"
+    assert client.rpc("scan_parcel", {"p_parcel_id": 99, "p_courier_id": 1, "p_location": "Hub"}).execute().data["error"] == "not_found"
+    assert len(client.table("tracking").select("*").eq("parcel_id", 1).execute().data) == 2
+
+
+def test_search_ranks_exact_then_prefix(client, seeded):
+    client.table("customers").insert({"name": "Alicia", "email": "alicia@example.com", "phone": "999", "address": "x"}).execute()
+    names = [r["name"] for r in client.rpc("search_customers", {"q": "alice"}).execute().data]
+    assert names == ["Alice"]
+    names = [r["name"] for r in client.rpc("search_customers", {"q": "ali"}).execute().data]
+    assert names == ["Alice", "Alicia"]
+
+
+# ----- Triggers -----
+def status_of(client, parcel_id):
+    return client.table("parcel_status").select("*").eq("parcel_id", parcel_id).execute().data[0]
+
+
+def add_event(client, parcel_id, location, timestamp):
+    return client.table("tracking").insert({"parcel_id": parcel_id, "courier_id": 1, "location": location,
+                                            "timestamp": timestamp}).execute().data[0]
+
+
+def test_parcel_status_follows_status_and_latest_event(client, seeded):
+    assert status_of(client, 1)["status"] == "Pending" and status_of(client, 1)["tracking_id"] is None
+    add_event(client, 1, "Hub", "2025-01-02T10:00:00")
+    add_event(client, 1, "Late scan of an earlier stop", "2025-01-01T10:00:00")
+    assert status_of(client, 1)["location"] == "Hub"
+    latest = add_event(client, 1, "Depot", "2025-01-03T10:00:00")
+    client.table("parcels").update({"status": "In Transit"}).eq("parcel_id", 1).execute()
+    assert (status_of(client, 1)["status"], status_of(client, 1)["location"]) == ("In Transit", "Depot")
+    client.table("tracking").delete().eq("tracking_id", latest["tracking_id"]).execute()
+    assert status_of(client, 1)["location"] == "Hub"
+    client.table("tracking").delete().eq("parcel_id", 1).execute()
+    assert status_of(client, 1)["tracking_id"] is None
+
+
+def test_rollups_count_inserts_moves_and_deletes(client, seeded):
+    event = add_event(client, 1, "Hub", "2025-01-01T10:15:00")
+    add_event(client, 2, "Hub", "2025-01-01T10:45:00")
+    rollup = lambda period, key: client.table("tracking_rollups").select("bucket,scans").eq("period", period) \
+        .eq("dimension", "location").eq("dimension_key", key).execute().data
+    assert rollup("hour", "Hub") == [{"bucket": "2025-01-01T10:00:00", "scans": 2}]
+    client.table("tracking").update({"location": "Depot"}).eq("tracking_id", event["tracking_id"]).execute()
+    assert rollup("day", "Hub") == [{"bucket": "2025-01-01T00:00:00", "scans": 1}]
+    assert rollup("day", "Depot") == [{"bucket": "2025-01-01T00:00:00", "scans": 1}]
+    client.table("tracking").delete().eq("tracking_id", event["tracking_id"]).execute()
+    assert rollup("day", "Depot") == [{"bucket": "2025-01-01T00:00:00", "scans": 0}]
+
+
+def test_assignment_released_when_parcel_leaves_pending(client, seeded):
+    client.table("assignments").insert([{"parcel_id": 1, "courier_id": 1}, {"parcel_id": 2, "courier_id": 1}]).execute()
+    client.rpc("scan_parcel", {"p_parcel_id": 1, "p_courier_id": 1, "p_location": "Hub", "p_status": "In Transit"}).execute()
+    client.table("parcels").update({"status": "Pending"}).eq("parcel_id", 2).execute()
+    assert [r["parcel_id"] for r in client.table("assignments").select("*").execute().data] == [2]
+
+
+def test_existing_database_is_backfilled_on_open(tmp_path):
+    path = str(tmp_path / "old.db")
+    client = SQLiteClient(path)
+    client.conn.executescript("""
+        DROP TRIGGER parcel_status_tracking_insert; DROP TRIGGER assignments_parcel_status;
+        DROP TRIGGER tracking_rollups_insert; DROP TRIGGER tracking_rollups_update; DROP TRIGGER tracking_rollups_delete;
+        DROP TABLE tracking_rollups;
+        INSERT INTO customers (name, email, phone, address) VALUES ('A', 'a@example.com', '1', 'a');
+        INSERT INTO couriers (name, phone) VALUES ('C', '1');
+        INSERT INTO parcels (sender_id, receiver_id, weight, price, status) VALUES (1, 1, 1, 1, 'Delivered'), (1, 1, 1, 1, 'Pending');
+        INSERT INTO tracking (parcel_id, courier_id, location, timestamp) VALUES (1, 1, 'Hub', '2025-01-01T10:00:00');
+        INSERT INTO assignments (parcel_id, courier_id) VALUES (1, 1), (2, 1);
+        DELETE FROM parcel_status;
+    """)
+    client.close()
+    client = SQLiteClient(path)
+    assert status_of(client, 1)["location"] == "Hub"
+    assert [r["parcel_id"] for r in client.table("assignments").select("*").execute().data] == [2]
+    assert client.table("tracking_rollups").select("scans").eq("period", "day").eq("dimension", "location").execute().data == [{"scans": 1}]
+    client.close()
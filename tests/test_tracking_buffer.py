@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+
+import pytest
+from src.db import InsertInterrupted
+from src.tracking_buffer import TrackingBuffer, BufferFull
+
+
+def scan(parcel_id, location="Hub"):
+    return {"parcel_id": parcel_id, "courier_id": 1, "location": location, "remarks": ""}
+
+
+def spilled(path):
+    with open(path) as f:
+        return [json.loads(line)["parcel_id"] for line in f if line.strip()]
+
+
+class Database:
+    """Flush callback standing in for TrackingManager.flush_buffered: parcel 99 is rejected, `down` fails every call"""
+    def __init__(self):
+        self.stored = []
+        self.down = False
+
+    async def flush(self, batch):
+        if self.down:
+            raise InsertInterrupted([], ConnectionError("database unavailable"))
+        results = []
+        for event in batch:
+            if event["parcel_id"] == 99:
+                results.append({"success": False, "message": "FOREIGN KEY constraint failed"})
+            else:
+                self.stored.append(event)
+                results.append({"success": True, "data": event})
+        return results
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_submitted_events_are_spilled_then_flushed(tmp_path):
+    path = str(tmp_path / "spill.ndjson")
+    db = Database()
+
+    async def scenario():
+        buffer = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path)
+        await buffer.start()
+        await asyncio.gather(*(buffer.submit(scan(p)) for p in (1, 2, 99)))
+        assert spilled(buffer.spill_path) == [1, 2, 99]
+        await buffer.flush_pending()
+        assert spilled(buffer.spill_path) == []
+        await buffer.stop()
+        return buffer.stats()
+
+    stats = run(scenario())
+    assert [e["parcel_id"] for e in db.stored] == [1, 2]
+    assert (stats["flushed"], stats["dropped"], stats["pending"]) == (2, 1, 0)
+
+
+def test_outage_keeps_events_queued_and_on_disk(tmp_path):
+    path = str(tmp_path / "spill.ndjson")
+    db = Database()
+
+    async def scenario():
+        buffer = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path)
+        await buffer.start()
+        for p in (1, 2, 3):
+            await buffer.submit(scan(p))
+        db.down = True
+        await buffer.flush_pending()
+        assert buffer.stats()["pending"] == 3 and spilled(buffer.spill_path) == [1, 2, 3]
+        db.down = False
+        await buffer.flush_pending()
+        await buffer.stop()
+        return buffer.spill_path
+
+    spill_path = run(scenario())
+    assert [e["parcel_id"] for e in db.stored] == [1, 2, 3]
+    assert not os.path.exists(spill_path)
+
+
+def test_partial_flush_keeps_only_unwritten_events(tmp_path):
+    path = str(tmp_path / "spill.ndjson")
+    stored = []
+
+    async def flush(batch):
+        stored.append(batch[0])
+        raise InsertInterrupted([{"success": True, "data": batch[0]}], ConnectionError("connection reset"))
+
+    async def scenario():
+        buffer = TrackingBuffer(flush, batch_size=100, interval=60, spill_path=path)
+        await buffer.start()
+        for p in (1, 2, 3):
+            await buffer.submit(scan(p))
+        await buffer.flush_pending()
+        return [e["parcel_id"] for e in buffer.pending], spilled(buffer.spill_path)
+
+    assert run(scenario()) == ([2, 3], [2, 3])
+
+
+def test_spilled_events_are_replayed_on_start(tmp_path):
+    path = str(tmp_path / "spill.ndjson")
+    with open(path, "w") as f:
+        f.writelines(json.dumps({**scan(p), "timestamp": "2025-01-01T10:00:00"}) + "\n" for p in (4, 5))
+    db = Database()
+
+    async def scenario():
+        buffer = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path)
+        await buffer.start()
+        await buffer.stop()
+
+    run(scenario())
+    assert [e["parcel_id"] for e in db.stored] == [4, 5]
+    assert not os.path.exists(path)
+
+
+def test_workers_keep_separate_spill_files(tmp_path):
+    path = str(tmp_path / "spill.ndjson")
+    db = Database()
+    db.down = True
+
+    async def scenario():
+        first = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path, worker=1)
+        second = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path, worker=2)
+        await first.start()
+        await second.start()
+        await first.submit(scan(1))
+        await second.submit(scan(2))
+        await second.flush_pending()  # rewrites only its own file
+        assert (spilled(first.spill_path), spilled(second.spill_path)) == ([1], [2])
+        # A third worker starting while both run takes over nothing
+        third = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path, worker=3)
+        await third.start()
+        assert third.stats()["pending"] == 0
+        first.spill.close()  # the first worker dies with its event unflushed
+        db.down = False
+        restarted = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path, worker=4)
+        await restarted.start()
+        again = TrackingBuffer(db.flush, batch_size=100, interval=60, spill_path=path, worker=5)
+        await again.start()
+        assert [e["parcel_id"] for e in restarted.pending] == [1] and again.stats()["pending"] == 0
+        assert not os.path.exists(first.spill_path)
+        for buffer in (second, third, restarted, again):
+            await buffer.stop()
+
+    run(scenario())
+    assert sorted(e["parcel_id"] for e in db.stored) == [1, 2]
+
+
+def test_full_buffer_applies_backpressure():
+    async def scenario():
+        buffer = TrackingBuffer(Database().flush, max_size=2, interval=60)
+        await buffer.submit(scan(1))
+        await buffer.submit(scan(2))
+        with pytest.raises(BufferFull):
+            await buffer.submit(scan(3))
+
+    run(scenario())